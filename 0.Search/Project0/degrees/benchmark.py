@@ -0,0 +1,320 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+
+import degrees
+from util import DequeFrontier, QueueFrontier, latency_summary
+
+FIRST_NAMES = ["Alex", "Ana", "Ben", "Chris", "Dana", "Eli", "Fay", "Gus",
+               "Hana", "Ivan", "Jo", "Kim", "Lee", "Mia", "Noor", "Omar",
+               "Pat", "Quinn", "Rosa", "Sam", "Tara", "Uma", "Vic", "Wen"]
+LAST_NAMES = ["Adams", "Baker", "Chen", "Diaz", "Evans", "Fox", "Garcia",
+              "Hill", "Ito", "Jones", "Khan", "Lopez", "Moore", "Nguyen",
+              "Ortiz", "Patel", "Reyes", "Smith", "Tanaka", "Young"]
+
+CAST_SIZES = ("fixed", "uniform", "geometric", "pareto")
+
+# Each strategy answers a (source, target) pair of person ids
+STRATEGIES = {
+    "frontier-list": lambda source, target: degrees.shortest_path(
+        source, target, frontier_class=QueueFrontier),
+    "frontier-deque": lambda source, target: degrees.shortest_path(
+        source, target, frontier_class=DequeFrontier),
+    "unidirectional": degrees.shortest_path,
+    "movies": lambda source, target: degrees.shortest_path(
+        source, target, by_movie=True),
+    "bidirectional": degrees.bidirectional_shortest_path,
+    "landmarks": None,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the degrees loaders and searches."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser(
+        "generate", help="write a synthetic people/movies/stars data set"
+    )
+    generate.add_argument("directory")
+    generate.add_argument("--people", type=int, default=100000)
+    generate.add_argument("--movies", type=int, default=50000)
+    generate.add_argument("--cast-size", choices=CAST_SIZES,
+                          default="geometric",
+                          help="distribution of the number of stars per movie")
+    generate.add_argument("--mean-cast", type=float, default=4.0)
+    generate.add_argument(
+        "--skew", type=float, default=1.0,
+        help="values above 1 concentrate credits on fewer, busier people"
+    )
+    generate.add_argument("--seed", type=int, default=0)
+
+    load = commands.add_parser("load", help="time the data loaders")
+    load.add_argument("directory")
+
+    queries = commands.add_parser(
+        "queries", help="time neighbors_for_person and search strategies"
+    )
+    queries.add_argument("directory")
+    queries.add_argument("--pairs", type=int, default=200)
+    queries.add_argument("--strategies", nargs="+", choices=list(STRATEGIES),
+                         default=[name for name in STRATEGIES
+                                  if name != "frontier-list"])
+    queries.add_argument("--landmarks", type=int, default=8)
+    queries.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        counts = generate_data(args.directory, args.people, args.movies,
+                               args.cast_size, args.mean_cast, args.skew,
+                               args.seed)
+        emit({"benchmark": "generate", "directory": args.directory,
+              "cast_size": args.cast_size, "mean_cast": args.mean_cast,
+              "skew": args.skew, "seed": args.seed, **counts})
+    elif args.command == "load":
+        for result in benchmark_loaders(args.directory):
+            emit(result)
+    else:
+        for result in benchmark_queries(args.directory, args.pairs,
+                                        args.strategies, args.landmarks,
+                                        args.seed):
+            emit(result)
+
+
+def emit(result):
+    """
+    Writes one benchmark result to stdout as a line of JSON.
+    """
+    result.setdefault("python", platform.python_version())
+    print(json.dumps(result), flush=True)
+
+
+def generate_data(directory, num_people, num_movies, cast_size="geometric",
+                  mean_cast=4.0, skew=1.0, seed=0):
+    """
+    Writes people.csv, movies.csv and stars.csv in the format load_data
+    reads, and returns how many rows of each were written.
+
+    Names are drawn from a small pool so that some are shared by several
+    people, as in the real data.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(num_people):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            if rng.random() < 0.5:
+                name += f" {person}"
+            birth = str(rng.randint(1900, 2005)) if rng.random() < 0.8 else ""
+            writer.writerow([person + 1, name, birth])
+
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie in range(num_movies):
+            writer.writerow([movie + 1, f"Movie {movie + 1}",
+                             rng.randint(1920, 2024)])
+
+    stars = 0
+    with open(os.path.join(directory, "stars.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(num_movies):
+            size = draw_cast_size(rng, cast_size, mean_cast)
+            for _ in range(min(size, num_people)):
+                person = int(num_people * rng.random() ** skew)
+                writer.writerow([person + 1, movie + 1])
+                stars += 1
+
+    return {"people": num_people, "movies": num_movies, "stars": stars}
+
+
+def draw_cast_size(rng, distribution, mean):
+    """
+    Returns a random cast size of at least 1 with roughly the given mean.
+    """
+    if distribution == "fixed":
+        return max(1, round(mean))
+    if distribution == "uniform":
+        return rng.randint(1, max(1, round(2 * mean - 1)))
+    if distribution == "geometric":
+        # Number of trials until the first success, with p = 1 / mean
+        size = 1
+        while rng.random() > 1 / max(mean, 1):
+            size += 1
+        return size
+    # Heavy-tailed: mostly small casts with the occasional huge ensemble
+    alpha = mean / (mean - 1) if mean > 1 else 2
+    return max(1, int(rng.paretovariate(alpha)))
+
+
+def benchmark_loaders(directory):
+    """
+    Returns timing results for the original loader, the streaming loader
+    and a warm snapshot start.
+    """
+    # Make sure the snapshot exists so that its result is a warm start
+    degrees.load_data(directory)
+
+    results = []
+    for name, loader in [("dictreader", legacy_load),
+                         ("streaming", streaming_load),
+                         ("snapshot", degrees.load_data)]:
+        seconds, peak = measure(loader, directory)
+        results.append({"benchmark": "load", "directory": directory,
+                        "loader": name, "seconds": seconds,
+                        "peak_bytes": peak})
+    return results
+
+
+def benchmark_queries(directory, num_pairs, strategies, num_landmarks=8,
+                      seed=0):
+    """
+    Yields timing results for neighbors_for_person and for every search
+    strategy over the same random (source, target) pairs.
+    """
+    reset()
+    degrees.load_data(directory)
+    rng = random.Random(seed)
+    person_ids = degrees.graph.person_ids
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids))
+             for _ in range(num_pairs)]
+    dataset = {"directory": directory, "people": len(person_ids),
+               "movies": len(degrees.graph.movie_ids),
+               "stars": len(degrees.graph.person_movies)}
+
+    latencies = []
+    for source, _ in pairs:
+        start = time.perf_counter()
+        degrees.neighbors_for_person(source)
+        latencies.append(time.perf_counter() - start)
+    yield {"benchmark": "neighbors", **dataset, **summarize(latencies)}
+
+    landmarks = None
+    for name in strategies:
+        search = STRATEGIES[name]
+        setup = 0
+        if name == "landmarks":
+            start = time.perf_counter()
+            if landmarks is None:
+                landmarks = degrees.build_landmarks(num_landmarks)
+            setup = time.perf_counter() - start
+            search = lambda source, target: degrees.shortest_path(
+                source, target, landmarks=landmarks)
+
+        latencies = []
+        connected = 0
+        for source, target in pairs:
+            start = time.perf_counter()
+            path = search(source, target)
+            latencies.append(time.perf_counter() - start)
+            connected += path is not None
+        yield {"benchmark": "query", "strategy": name, **dataset,
+               "setup_seconds": setup, "connected": connected,
+               **summarize(latencies)}
+
+
+def summarize(latencies):
+    """
+    Returns throughput and latency percentiles for a list of timings.
+    """
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "seconds": total,
+        "per_second": len(ordered) / total if total else None,
+        **latency_summary(ordered),
+    }
+
+
+def measure(function, *args):
+    """
+    Returns the wall time of one call to `function`, and the peak memory
+    traced during a second call.
+    """
+    reset()
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+
+    reset()
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    reset()
+    return seconds, peak
+
+
+def reset():
+    """
+    Empties everything degrees.load_data fills in.
+    """
+    degrees.clear_data()
+
+
+def streaming_load(directory):
+    """
+    Loads the data with the current chunked loader, bypassing the snapshot.
+    """
+    degrees.load_data(directory, use_snapshot=False)
+
+
+def legacy_load(directory):
+    """
+    Loads the data the way the original loader did, with a DictReader
+    and a set of ids per person and per movie.
+    """
+    names = {}
+    people = {}
+    movies = {}
+
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            people[row["id"]] = {
+                "name": row["name"],
+                "birth": row["birth"],
+                "movies": set(),
+            }
+            if row["name"].lower() not in names:
+                names[row["name"].lower()] = {row["id"]}
+            else:
+                names[row["name"].lower()].add(row["id"])
+
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            movies[row["id"]] = {
+                "title": row["title"],
+                "year": row["year"],
+                "stars": set(),
+            }
+
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                people[row["person_id"]]["movies"].add(row["movie_id"])
+                movies[row["movie_id"]]["stars"].add(row["person_id"])
+            except KeyError:
+                pass
+
+    return names, people, movies
+
+
+if __name__ == "__main__":
+    main()
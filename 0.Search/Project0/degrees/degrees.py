@@ -1,66 +1,353 @@
+import argparse
 import csv
+import itertools
+import multiprocessing
+import operator
+import struct
 import sys
+import time
+from array import array
+from collections import deque
 
-from util import Node, QueueFrontier
+import snapshot
+from graph import ARRAYS, Graph
+from landmarks import LandmarkIndex, pick_landmarks
+from nameindex import NameIndex
+from tables import (GroupTable, RecordTable, StringTable, TableIndex,
+                    pack_strings, sorted_order)
+from util import Node, DequeFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
 
-# Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
+# Maps person_ids to a dictionary of: name, birth
 people = {}
 
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
+# Maps movie_ids to a dictionary of: title, year
 movies = {}
 
+# After a warm start these three are read-only mappings over the
+# snapshot, which make_writable turns back into dicts before an update
 
-def load_data(directory):
+# Interned people/movies graph holding who starred in what
+graph = Graph()
+
+# Prefix and typo-tolerant search over the keys of `names`
+name_index = NameIndex()
+
+SOURCE_FILES = ("people.csv", "movies.csv", "stars.csv")
+SNAPSHOT_FILE = "degrees.snapshot"
+
+# Number of CSV rows read and interned at a time while loading
+CHUNK_SIZE = 65536
+
+
+def load_data(directory, use_snapshot=True):
     """
     Load data from CSV files into memory.
+
+    Unless `use_snapshot` is False, the loaded data is also saved as a
+    binary snapshot in the same directory, and later calls map that
+    snapshot instead of parsing the CSV files again for as long as the
+    CSV files are unchanged.
+
+    Returns a dict counting the people, movies and star credits loaded,
+    and the rows of each file that were dropped as malformed or, for
+    stars, as naming an unknown person or movie.
     """
+    clear_data()
+    snapshot_path = f"{directory}/{SNAPSHOT_FILE}"
+    if use_snapshot:
+        sources = snapshot.source_stats(directory, SOURCE_FILES)
+        loaded = snapshot.load(snapshot_path, sources)
+        if loaded is not None:
+            metadata, sections = loaded
+            attach_sections(sections)
+            return metadata["stats"]
+
+    stats = {"dropped_people": 0, "dropped_movies": 0, "dropped_stars": 0}
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set(),
+    for chunk in read_chunks(f"{directory}/people.csv",
+                             ("id", "name", "birth"), stats, "dropped_people"):
+        for person_id, name, birth in chunk:
+            people[person_id] = {
+                "name": name,
+                "birth": birth,
             }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+            key = name.lower()
+            if key not in names:
+                names[key] = {person_id}
             else:
-                names[row["name"].lower()].add(row["id"])
+                names[key].add(person_id)
+        graph.intern_people(person_id for person_id, _, _ in chunk)
+    name_index.build(names)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set(),
+    for chunk in read_chunks(f"{directory}/movies.csv",
+                             ("id", "title", "year"), stats, "dropped_movies"):
+        for movie_id, title, year in chunk:
+            movies[movie_id] = {
+                "title": title,
+                "year": year,
             }
+        graph.intern_movies(movie_id for movie_id, _, _ in chunk)
+
+    # Load stars, interning a whole chunk of ids at a time and dropping
+    # rows that name an unknown person or movie
+    edge_people = array("i")
+    edge_movies = array("i")
+    person_index = graph.person_index.get
+    movie_index = graph.movie_index.get
+    for chunk in read_chunks(f"{directory}/stars.csv",
+                             ("person_id", "movie_id"), stats,
+                             "dropped_stars"):
+        if not chunk:
+            continue
+        person_ids, movie_ids = zip(*chunk)
+        chunk_people = list(map(person_index, person_ids))
+        chunk_movies = list(map(movie_index, movie_ids))
+        if None in chunk_people or None in chunk_movies:
+            pairs = [(person, movie)
+                     for person, movie in zip(chunk_people, chunk_movies)
+                     if person is not None and movie is not None]
+            stats["dropped_stars"] += len(chunk) - len(pairs)
+            chunk_people = [person for person, _ in pairs]
+            chunk_movies = [movie for _, movie in pairs]
+        edge_people.extend(chunk_people)
+        edge_movies.extend(chunk_movies)
+    graph.build(edge_people, edge_movies)
+
+    stats["people"] = len(graph.person_ids)
+    stats["movies"] = len(graph.movie_ids)
+    stats["stars"] = len(graph.person_movies)
+
+    if use_snapshot:
+        try:
+            snapshot.save(snapshot_path, sources, {"stats": stats},
+                          snapshot_sections())
+        except OSError:
+            # A read-only data directory just means no warm starts
+            pass
+    return stats
+
+
+def snapshot_sections():
+    """
+    Returns the loaded data as the named arrays and buffers of a snapshot.
+
+    Every table of ids, names and titles is stored as UTF-8 strings packed
+    end to end with an array of their offsets, and the tables looked up by
+    string come with their positions in sorted order to binary search.
+    """
+    sections = {name: getattr(graph, name) for name in ARRAYS}
+
+    def add_strings(name, strings):
+        sections[f"{name}.offsets"], sections[f"{name}.data"] = \
+            pack_strings(strings)
+
+    add_strings("person_ids", graph.person_ids)
+    sections["person_order"] = sorted_order(graph.person_ids)
+    add_strings("person_names",
+                (people[person_id]["name"] for person_id in graph.person_ids))
+    add_strings("person_births",
+                (people[person_id]["birth"] for person_id in graph.person_ids))
+    add_strings("movie_ids", graph.movie_ids)
+    sections["movie_order"] = sorted_order(graph.movie_ids)
+    add_strings("movie_titles",
+                (movies[movie_id]["title"] for movie_id in graph.movie_ids))
+    add_strings("movie_years",
+                (movies[movie_id]["year"] for movie_id in graph.movie_ids))
+
+    # Names in name index order, with the interned people of each
+    add_strings("index_names", name_index.names)
+    sections["index_order"] = sorted_order(name_index.names)
+    name_offsets = array("q", [0])
+    name_people = array("i")
+    for name in name_index.names:
+        name_people.extend(sorted(map(graph.person_index.__getitem__,
+                                      names[name])))
+        name_offsets.append(len(name_people))
+    sections["name_offsets"] = name_offsets
+    sections["name_people"] = name_people
+
+    # Trigrams in sorted order, with their postings
+    trigram_keys = sorted(name_index.trigrams)
+    add_strings("trigram_keys", trigram_keys)
+    trigram_offsets = array("q", [0])
+    trigram_postings = array("i")
+    for trigram in trigram_keys:
+        trigram_postings.extend(name_index.trigrams[trigram])
+        trigram_offsets.append(len(trigram_postings))
+    sections["trigram_offsets"] = trigram_offsets
+    sections["trigram_postings"] = trigram_postings
+    return sections
+
+
+def attach_sections(sections):
+    """
+    Points the loaded data at the sections of a mapped snapshot, written
+    by snapshot_sections, so that strings are only decoded when looked up.
+    """
+    global names, people, movies
+
+    def strings(name):
+        return StringTable(sections[f"{name}.offsets"],
+                           sections[f"{name}.data"])
 
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    for name in ARRAYS:
+        setattr(graph, name, sections[name])
+    graph.person_ids = strings("person_ids")
+    graph.person_index = TableIndex(graph.person_ids,
+                                    sections["person_order"])
+    graph.movie_ids = strings("movie_ids")
+    graph.movie_index = TableIndex(graph.movie_ids, sections["movie_order"])
+    people = RecordTable(graph.person_index, {
+        "name": strings("person_names"),
+        "birth": strings("person_births"),
+    })
+    movies = RecordTable(graph.movie_index, {
+        "title": strings("movie_titles"),
+        "year": strings("movie_years"),
+    })
+
+    person_ids = graph.person_ids
+    index_names = TableIndex(strings("index_names"), sections["index_order"])
+    names = GroupTable(index_names, sections["name_offsets"],
+                       sections["name_people"],
+                       lambda row: {person_ids[person] for person in row})
+    name_index.names = index_names.table
+    name_index.sorted_names = index_names.sorted
+
+    trigram_keys = strings("trigram_keys")
+    name_index.trigrams = GroupTable(
+        TableIndex(trigram_keys, range(len(trigram_keys))),
+        sections["trigram_offsets"], sections["trigram_postings"]
+    )
+
+
+def clear_data():
+    """
+    Empties everything load_data fills in.
+    """
+    global names, people, movies
+    names = {}
+    people = {}
+    movies = {}
+    graph.clear()
+    name_index.clear()
+
+
+def make_writable():
+    """
+    Copies any tables still mapped read-only from a snapshot into
+    ordinary dicts so that they can be updated.
+    """
+    global names, people, movies
+    if not isinstance(names, dict):
+        names = names.copy()
+    if not isinstance(people, dict):
+        people = people.copy()
+    if not isinstance(movies, dict):
+        movies = movies.copy()
+
+
+def read_chunks(path, columns, stats, dropped, chunk_size=CHUNK_SIZE):
+    """
+    Reads a CSV file with a plain csv.reader and yields lists of up to
+    `chunk_size` rows, each a tuple of the named columns in order.
+
+    Rows with the wrong number of fields are skipped and counted in
+    stats[dropped].
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        project = operator.itemgetter(
+            *[header.index(column) for column in columns]
+        )
+        width = len(header)
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            chunk = [project(row) for row in rows if len(row) == width]
+            stats[dropped] += len(rows) - len(chunk)
+            yield chunk
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two people."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument(
+        "--search", choices=["unidirectional", "bidirectional", "movies"],
+        default="unidirectional",
+        help="search from the source only, from both ends at once, or "
+             "from the source expanding each movie's cast only once"
+    )
+    parser.add_argument(
+        "--no-snapshot", action="store_true",
+        help="always parse the CSV files and do not write a snapshot"
+    )
+    parser.add_argument(
+        "--batch", nargs="?", const="-", metavar="FILE",
+        help="answer tab-separated source/target pairs from FILE "
+             "(or stdin) instead of prompting, one line per pair in "
+             "input order"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of processes used by --batch (default: all CPUs)"
+    )
+    parser.add_argument(
+        "--landmarks", type=int, default=0, metavar="K",
+        help="build a distance oracle from K landmark people, print its "
+             "bounds and use them to prune the search"
+    )
+    parser.add_argument(
+        "--paths", type=int, default=1, metavar="K",
+        help="print up to K different shortest paths"
+    )
+    parser.add_argument(
+        "--distances", action="store_true",
+        help="print how many people are each number of degrees away "
+             "from one person"
+    )
+    parser.add_argument(
+        "--save-tree", metavar="FILE",
+        help="with --distances, also save the search tree to FILE"
+    )
+    args = parser.parse_args()
 
     # Load data from files into memory
+    if args.batch is not None:
+        load_data(args.directory, use_snapshot=not args.no_snapshot)
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, args.workers, args.search)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, args.workers, args.search)
+        return
+
     print("Loading data...")
-    load_data(directory)
+    stats = load_data(args.directory, use_snapshot=not args.no_snapshot)
     print("Data loaded.")
+    if stats["dropped_stars"]:
+        print(f"Skipped {stats['dropped_stars']} stars rows "
+              "with unknown or malformed ids.")
+
+    if args.distances:
+        source = person_id_for_name(input("Name: "))
+        if source is None:
+            sys.exit("Person not found.")
+        tree = distances_from(source)
+        for degrees, count in enumerate(tree.histogram()):
+            print(f"{degrees} degrees of separation: {count} people")
+        if args.save_tree:
+            tree.save(args.save_tree)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,58 +356,452 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    landmarks = None
+    if args.landmarks > 0:
+        landmarks = build_landmarks(args.landmarks)
+        bounds = degree_bounds(source, target, landmarks)
+        if bounds is not None and bounds[1] is not None:
+            print(f"Between {bounds[0]} and {bounds[1]} degrees of separation.")
+
+    if args.paths > 1:
+        paths = list(all_shortest_paths(source, target, args.paths))
+        if not paths:
+            print("Not connected.")
+        for number, path in enumerate(paths, 1):
+            print(f"Path {number}:")
+            print_path(source, path)
+        return
+
+    if args.search == "bidirectional":
+        path = bidirectional_shortest_path(source, target)
+    else:
+        path = shortest_path(source, target, landmarks=landmarks,
+                             by_movie=args.search == "movies")
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(source, path)
+
 
+def print_path(source, path):
+    """
+    Prints the degrees of separation and every step of a path.
+    """
+    degrees = len(path)
+    print(f"{degrees} degrees of separation.")
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
-def shortest_path(source, target):
+
+def shortest_path(source, target, frontier_class=None, landmarks=None,
+                  by_movie=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If no possible path, returns None.
+
+    The search runs directly over the interned graph. Passing a
+    `frontier_class` (DequeFrontier or QueueFrontier) runs the
+    node-based search with that frontier instead, passing a
+    LandmarkIndex prunes people who cannot be on a shortest path, and
+    `by_movie` expands the cast of every movie at most once.
+    """
+    if frontier_class is not None:
+        return frontier_shortest_path(source, target, frontier_class)
+    if source == target:
+        return []
+
+    start = graph.person_index[source]
+    goal = graph.person_index[target]
+    if not graph.connected(start, goal):
+        return None
+    if landmarks is not None:
+        parent_people, parent_movies = pruned_breadth_first(start, goal,
+                                                            landmarks)
+    elif by_movie:
+        parent_people, parent_movies = movie_breadth_first(start, goal)
+    else:
+        parent_people, parent_movies = breadth_first(start, goal)
+    if parent_people[goal] == -1:
+        return None
+    return trace_path(parent_people, parent_movies, goal)
+
+
+def all_shortest_paths(source, target, k=None):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, or only the first k of them.
+
+    One breadth-first search, stopped at the target's level, records how
+    far everyone up to that level is from the source. Paths are then
+    walked back from the target one level at a time, only as far as the
+    caller keeps asking, so the possibly exponential set of paths is
+    never built up in memory.
+    """
+    if k is not None and k <= 0:
+        return
+    if source == target:
+        yield []
+        return
+
+    start = graph.person_index[source]
+    goal = graph.person_index[target]
+    if not graph.connected(start, goal):
+        return
+    distances = distances_from(source, target).distances
+
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_people = graph.movie_people
+
+    def walk(person, suffix):
+        # Extends a path suffix ending at the target back to the source
+        # through everyone exactly one level closer to it
+        if person == start:
+            yield suffix
+            return
+        level = distances[person] - 1
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            step = [(movie, person)]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                star = movie_people[j]
+                if distances[star] == level:
+                    yield from walk(star, step + suffix)
+
+    for count, path in enumerate(walk(goal, []), 1):
+        yield [(graph.movie_ids[movie], graph.person_ids[person])
+               for movie, person in path]
+        if count == k:
+            return
+
+
+def breadth_first(start, goal=-1):
+    """
+    Searches the graph outwards from the interned person `start` until
+    the interned person `goal` is reached, or until everyone connected
+    to `start` has been reached if no goal is given.
+
+    Returns the (parent person, parent movie) arrays of the search tree.
+    """
+    parent_people, parent_movies = new_parents()
+    parent_people[start] = start
+
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_people = graph.movie_people
+
+    queue = deque([start])
+    while queue:
+        person = queue.popleft()
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                star = movie_people[j]
+                if parent_people[star] != -1:
+                    continue
+                parent_people[star] = person
+                parent_movies[star] = movie
+                if star == goal:
+                    return parent_people, parent_movies
+                queue.append(star)
+
+    return parent_people, parent_movies
+
+
+def movie_breadth_first(start, goal=-1):
+    """
+    Same as breadth_first, but treats movies as intermediate nodes of the
+    search: the first time a movie is reached its whole cast is reached
+    with it, so every movie is expanded at most once and the search does
+    work linear in the number of star credits rather than once per
+    (movie, co-star) pair seen.
+    """
+    parent_people, parent_movies = new_parents()
+    parent_people[start] = start
+    seen_movies = bytearray(len(graph.movie_ids))
+
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_people = graph.movie_people
+
+    queue = deque([start])
+    while queue:
+        person = queue.popleft()
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            if seen_movies[movie]:
+                continue
+            seen_movies[movie] = 1
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                star = movie_people[j]
+                if parent_people[star] != -1:
+                    continue
+                parent_people[star] = person
+                parent_movies[star] = movie
+                if star == goal:
+                    return parent_people, parent_movies
+                queue.append(star)
+
+    return parent_people, parent_movies
+
+
+def pruned_breadth_first(start, goal, landmarks):
+    """
+    Same as breadth_first towards a goal, but does not expand anyone
+    whose landmark lower bound to the goal shows they cannot lie on a
+    path within the landmark upper bound.
+    """
+    upper = landmarks.bounds(start, goal)[1]
+    if upper is None:
+        return breadth_first(start, goal)
+    profile = landmarks.profile(goal)
+
+    parent_people, parent_movies = new_parents()
+    parent_people[start] = start
+
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_people = graph.movie_people
+
+    level = [start]
+    distance = 0
+    while level:
+        distance += 1
+        next_level = []
+        for person in level:
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_people[j]
+                    if parent_people[star] != -1:
+                        continue
+                    parent_people[star] = person
+                    parent_movies[star] = movie
+                    if star == goal:
+                        return parent_people, parent_movies
+                    if distance + landmarks.lower_bound(star, profile) <= upper:
+                        next_level.append(star)
+        level = next_level
+
+    return parent_people, parent_movies
+
+
+def build_landmarks(k=8):
+    """
+    Returns a LandmarkIndex over the loaded graph using the k people
+    with the most co-star credits as landmarks.
+    """
+    chosen = pick_landmarks(graph, k)
+    distances = [distances_from(graph.person_ids[landmark]).distances
+                 for landmark in chosen]
+    return LandmarkIndex(chosen, distances)
+
+
+def degree_bounds(source, target, landmarks):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two person ids from a LandmarkIndex, without searching.
+
+    Returns None if they are not connected at all, and the upper bound
+    is None if no landmark reaches them.
+    """
+    if source == target:
+        return 0, 0
+    start = graph.person_index[source]
+    goal = graph.person_index[target]
+    if not graph.connected(start, goal):
+        return None
+    lower, upper = landmarks.bounds(start, goal)
+    return max(lower, 1), upper
+
+
+class SearchTree():
+    """
+    Breadth-first search tree rooted at one person, holding the degrees
+    of separation and the parent step of everyone reachable from them.
+    """
+
+    # magic, number of people in the graph, interned source
+    HEADER = struct.Struct("<8sii")
+    MAGIC = b"DEGTREE1"
+
+    def __init__(self, source, distances, parent_people, parent_movies):
+        self.source = source
+        self.distances = distances
+        self.parent_people = parent_people
+        self.parent_movies = parent_movies
+
+    def distance(self, person_id):
+        """
+        Returns the degrees of separation from the source to a person,
+        or None if they are not connected.
+        """
+        distance = self.distances[graph.person_index[person_id]]
+        return None if distance == -1 else distance
+
+    def path_to(self, person_id):
+        """
+        Returns the (movie_id, person_id) pairs from the source to a
+        person, or None if they are not connected.
+        """
+        person = graph.person_index[person_id]
+        if self.parent_people[person] == -1:
+            return None
+        return trace_path(self.parent_people, self.parent_movies, person)
+
+    def histogram(self):
+        """
+        Returns a list whose i-th entry is the number of people exactly
+        i degrees away from the source.
+        """
+        counts = []
+        for distance in self.distances:
+            if distance == -1:
+                continue
+            while len(counts) <= distance:
+                counts.append(0)
+            counts[distance] += 1
+        return counts
+
+    def save(self, path):
+        """
+        Writes the tree to a binary file that load_tree can read back
+        for the same graph.
+        """
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(self.distances),
+                                     graph.person_index[self.source]))
+            self.distances.tofile(f)
+            self.parent_people.tofile(f)
+            self.parent_movies.tofile(f)
+
+
+def load_tree(path):
+    """
+    Reads back a SearchTree written by SearchTree.save.
+    """
+    with open(path, "rb") as f:
+        header = f.read(SearchTree.HEADER.size)
+        magic, size, source = SearchTree.HEADER.unpack(header)
+        if magic != SearchTree.MAGIC or size != len(graph.person_ids):
+            raise ValueError(f"{path} was not saved for the loaded data")
+        arrays = []
+        for _ in range(3):
+            values = array("i")
+            values.fromfile(f, size)
+            arrays.append(values)
+    return SearchTree(graph.person_ids[source], *arrays)
+
+
+def distances_from(person_id, goal_id=None):
+    """
+    Returns the SearchTree of everyone connected to a person, built by
+    one level-by-level breadth-first traversal of the graph.
+
+    With a `goal_id`, the traversal stops once the goal's level is done,
+    so the tree only covers people at most as far away as the goal.
+    """
+    start = graph.person_index[person_id]
+    goal = -1 if goal_id is None else graph.person_index[goal_id]
+    parent_people, parent_movies = new_parents()
+    distances = array("i", [-1]) * len(graph.person_ids)
+    parent_people[start] = start
+    distances[start] = 0
+
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_people = graph.movie_people
+
+    # As in movie_breadth_first, each movie's cast is expanded only once
+    seen_movies = bytearray(len(graph.movie_ids))
+
+    # Everyone closer than the goal is already reached by the time the
+    # goal itself is, so the search can stop there
+    level = [start]
+    distance = 0
+    while level and (goal == -1 or distances[goal] == -1):
+        distance += 1
+        next_level = []
+        for person in level:
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                if seen_movies[movie]:
+                    continue
+                seen_movies[movie] = 1
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_people[j]
+                    if distances[star] != -1:
+                        continue
+                    distances[star] = distance
+                    parent_people[star] = person
+                    parent_movies[star] = movie
+                    next_level.append(star)
+        level = next_level
+
+    return SearchTree(person_id, distances, parent_people, parent_movies)
+
+
+def new_parents():
+    """
+    Returns empty (parent person, parent movie) arrays for a search,
+    with -1 marking people that have not been reached.
+    """
+    size = len(graph.person_ids)
+    return array("i", [-1]) * size, array("i", [-1]) * size
+
+
+def trace_path(parent_people, parent_movies, person):
+    """
+    Follows parent links back from a reached person to the start of
+    the search, returning the (movie_id, person_id) pairs in order.
+    """
+    path = []
+    while parent_people[person] != person:
+        path.append((graph.movie_ids[parent_movies[person]],
+                     graph.person_ids[person]))
+        person = parent_people[person]
+    path.reverse()
+    return path
+
+
+def frontier_shortest_path(source, target, frontier_class=DequeFrontier):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching Node by Node
+    through neighbors_for_person with the given frontier class.
+
     If no possible path, returns None.
     """
-    # TODO
     # path列表
     path = []
     # 长度为0时，说明source和target是同一个人
     if source == target:
         return path
     # queue队列
-    frontier = QueueFrontier()
+    frontier = frontier_class()
     # 被探索过的id集合
     explored = set()
     # 将初始点加到队列中
     start_node = Node(source, None, None)
     frontier.add(start_node)
-    # whiletrue
-    while True:
-        # 如果队列为空，返回none
-        if frontier.empty():
-            return None
+    # 队列为空时说明没有路径
+    while not frontier.empty():
         # 弹出队头
         cur_node = frontier.remove()
-        # 终点时，返回最终的end_node
-        # if cur_node.state == target:
-        #     end_node = cur_node
-        #     while end_node.parent is not None:
-        #         path.append((end_node.action, end_node.state))
-        #         end_node = end_node.parent
-        #     path.reverse()
-        #     return path
-
-        # 不是终点，检查是不是已经被探索过了
+
+        # 检查是不是已经被探索过了，终点在加入队列之前就检查过了
         if cur_node.state in explored:
             continue
         else:
@@ -140,24 +821,234 @@ def shortest_path(source, target):
                     return path
 
                 # 已经在队列里面的和被探索过的都不再加了
-                if frontier.contains_state(person_id) or person_id in explored:
+                if frontier.contains_state(person_id) or \
+                        person_id in explored:
                     continue
                 # 如果都不是的话，把这个点加到frontier里面
                 new_node = Node(person_id, cur_node, movie_id)
                 frontier.add(new_node)
 
-    raise NotImplementedError
+    return None
+
+
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the same path as shortest_path, but searches outwards
+    from both the source and the target one level at a time, always
+    expanding the smaller of the two frontiers, until they meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    start = graph.person_index[source]
+    goal = graph.person_index[target]
+    if not graph.connected(start, goal):
+        return None
+
+    # Each side records, for every person it reached, the neighbor and
+    # movie leading back towards the person that side started from
+    forward = new_parents()
+    backward = new_parents()
+    forward[0][start] = start
+    backward[0][goal] = goal
+    forward_frontier = [start]
+    backward_frontier = [goal]
+
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+    movie_people = graph.movie_people
+
+    while forward_frontier and backward_frontier:
+        expand_forward = len(forward_frontier) <= len(backward_frontier)
+        if expand_forward:
+            frontier, reached, other = forward_frontier, forward, backward
+        else:
+            frontier, reached, other = backward_frontier, backward, forward
+        reached_people, reached_movies = reached
+        other_people = other[0]
+
+        next_frontier = []
+        for person in frontier:
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_people[j]
+                    if reached_people[star] != -1:
+                        continue
+                    reached_people[star] = person
+                    reached_movies[star] = movie
+                    if other_people[star] != -1:
+                        return join_paths(forward, backward, star)
+                    next_frontier.append(star)
+
+        if expand_forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Builds the list of (movie_id, person_id) pairs from the source to
+    the target through the person where both searches met.
+    """
+    path = trace_path(forward[0], forward[1], meeting)
+
+    backward_people, backward_movies = backward
+    person = meeting
+    while backward_people[person] != person:
+        next_person = backward_people[person]
+        path.append((graph.movie_ids[backward_movies[person]],
+                     graph.person_ids[next_person]))
+        person = next_person
+    return path
+
+
+def run_batch(lines, output, workers=None, search="unidirectional"):
+    """
+    Answers every tab-separated "source<TAB>target" pair in `lines`,
+    where each side is a person id or an unambiguous name, and writes
+    one tab-separated result line per pair to `output`, in the order the
+    pairs were given.
+
+    Pairs are grouped by source so that a source asked about more than
+    once is searched only once, and groups are spread over `workers`
+    forked processes which share the loaded graph copy-on-write.
+    `search` picks the single-pair search as for the --search option.
+    """
+    groups = {}
+    count = 0
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        source, _, target = line.partition("\t")
+        groups.setdefault(source.strip(), []).append((count, target.strip()))
+        count += 1
+    jobs = [(source, targets, search)
+            for source, targets in groups.items()]
+
+    if workers == 1 or len(jobs) <= 1 or \
+            "fork" not in multiprocessing.get_all_start_methods():
+        write_in_order(map(answer_group, jobs), output)
+        return
+
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        write_in_order(pool.imap_unordered(answer_group, jobs), output)
+
+
+def write_in_order(results, output):
+    """
+    Writes the (index, line) pairs of each group's results to `output`
+    in index order, holding back lines until those before them arrive.
+    """
+    pending = {}
+    next_index = 0
+    for result in results:
+        pending.update(result)
+        while next_index in pending:
+            output.write(pending.pop(next_index))
+            next_index += 1
+        output.flush()
+
+
+def answer_group(job):
+    """
+    Returns (index, result line) pairs for one source and all of its
+    (index, target) pairs.
+    """
+    source, targets, search = job
+    source_id = lookup_person(source)
+    if source_id is None:
+        return [(index, f"{source}\t{target}\tPerson not found.\n")
+                for index, target in targets]
+
+    tree = None
+    lines = []
+    for index, target in targets:
+        target_id = lookup_person(target)
+        if target_id is None:
+            lines.append((index, f"{source}\t{target}\tPerson not found.\n"))
+            continue
+
+        if source_id == target_id:
+            path = []
+        elif len(targets) == 1:
+            if search == "bidirectional":
+                path = bidirectional_shortest_path(source_id, target_id)
+            else:
+                path = shortest_path(source_id, target_id,
+                                     by_movie=search == "movies")
+        else:
+            start = graph.person_index[source_id]
+            goal = graph.person_index[target_id]
+            if not graph.connected(start, goal):
+                path = None
+            else:
+                if tree is None:
+                    tree = movie_breadth_first(start)
+                path = trace_path(*tree, goal)
+
+        if path is None:
+            lines.append((index, f"{source}\t{target}\tNot connected.\n"))
+        else:
+            steps = " ".join(f"{movie_id}:{person_id}"
+                             for movie_id, person_id in path)
+            lines.append((index,
+                          f"{source}\t{target}\t{len(path)}\t{steps}\n"))
+    return lines
+
+
+def lookup_person(text):
+    """
+    Returns the person id for a person id or an unambiguous name,
+    without ever prompting. Returns None otherwise.
+    """
+    if text in people:
+        return text
+    return person_id_for_name(text, interactive=False)
+
+
+def search_people(query, limit=10):
+    """
+    Returns up to `limit` people whose names match a possibly partial or
+    misspelt query, best match first, as (person_id, name, birth) tuples.
+
+    Never prompts, so it is safe to call from scripts.
+    """
+    candidates = []
+    for name, _ in name_index.search(query.lower(), limit):
+        for person_id in sorted(names[name]):
+            person = people[person_id]
+            candidates.append((person_id, person["name"], person["birth"]))
+    return candidates[:limit]
 
 
-def person_id_for_name(name):
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If `interactive` is False, an ambiguous name returns None instead of
+    asking which person was meant.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
+        if interactive:
+            suggestions = search_people(name, 5)
+            if suggestions:
+                print("Did you mean:")
+                for person_id, match, birth in suggestions:
+                    print(f"ID: {person_id}, Name: {match}, Birth: {birth}")
         return None
     elif len(person_ids) > 1:
+        if not interactive:
+            return None
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -175,16 +1066,138 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def add_person(person_id, name, birth=""):
+    """
+    Adds a person to the loaded data, updating the name index and graph.
+    Adding a known person id replaces their name and birth.
+    """
+    make_writable()
+    previous = people.get(person_id)
+    people[person_id] = {
+        "name": name,
+        "birth": birth,
+    }
+    key = name.lower()
+    if previous is not None and previous["name"].lower() != key:
+        # A renamed person is no longer found under their old name
+        old_key = previous["name"].lower()
+        names[old_key].discard(person_id)
+        if not names[old_key]:
+            del names[old_key]
+            name_index.remove(old_key)
+    if key not in names:
+        names[key] = {person_id}
+        name_index.add(key)
+    else:
+        names[key].add(person_id)
+    graph.add_person(person_id)
+
+
+def add_movie(movie_id, title, year=""):
+    """
+    Adds a movie to the loaded data.
+    """
+    make_writable()
+    movies[movie_id] = {
+        "title": title,
+        "year": year,
+    }
+    graph.add_movie(movie_id)
+
+
+def add_stars(pairs):
+    """
+    Adds (person_id, movie_id) credits to the loaded graph, updating its
+    component labels, and returns how many were dropped for naming an
+    unknown person or movie.
+
+    Added credits can only shorten paths, so a LandmarkIndex built
+    before them may give wrong lower bounds and should be rebuilt.
+    """
+    edge_people = array("i")
+    edge_movies = array("i")
+    dropped = 0
+    for person_id, movie_id in pairs:
+        person = graph.person_index.get(person_id)
+        movie = graph.movie_index.get(movie_id)
+        if person is None or movie is None:
+            dropped += 1
+            continue
+        edge_people.append(person)
+        edge_movies.append(movie)
+    if edge_people:
+        graph.add_credits(edge_people, edge_movies)
+    return dropped
+
+
+def tail_csv(path, interval=1.0, follow=True):
+    """
+    Applies the rows of a people.csv, movies.csv or stars.csv style file,
+    recognised by its header, to the loaded data, and yields (applied,
+    dropped) row counts each time more arrive.
+
+    As in load_data, rows with the wrong number of fields are dropped,
+    and so are stars rows naming an unknown person or movie.
+
+    With `follow`, keeps waiting `interval` seconds at a time for rows
+    appended to the file, like `tail -f`; otherwise stops at its end.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        header = next(csv.reader([f.readline()]), [])
+        if {"person_id", "movie_id"} <= set(header):
+            columns = ("person_id", "movie_id")
+        elif {"id", "name", "birth"} <= set(header):
+            columns = ("id", "name", "birth")
+        elif {"id", "title", "year"} <= set(header):
+            columns = ("id", "title", "year")
+        else:
+            raise ValueError(f"{path} is not a people, movies or stars file")
+        project = operator.itemgetter(
+            *[header.index(column) for column in columns]
+        )
+
+        while True:
+            # Only take whole lines, so a row being written is left
+            # for the next read
+            lines = []
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line.endswith("\n"):
+                    f.seek(position)
+                    break
+                lines.append(line)
+
+            rows = [project(row) for row in csv.reader(lines)
+                    if len(row) == len(header)]
+            dropped = len(lines) - len(rows)
+            if rows:
+                if columns[0] == "person_id":
+                    dropped += add_stars(rows)
+                elif columns[1] == "name":
+                    for person_id, name, birth in rows:
+                        add_person(person_id, name, birth)
+                else:
+                    for movie_id, title, year in rows:
+                        add_movie(movie_id, title, year)
+            if lines:
+                yield len(lines) - dropped, dropped
+
+            if not follow:
+                return
+            time.sleep(interval)
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie in graph.movies_for(graph.person_index[person_id]):
+        movie_id = graph.movie_ids[movie]
+        for person in graph.stars_for(movie):
+            neighbors.add((movie_id, graph.person_ids[person]))
     return neighbors
 
 
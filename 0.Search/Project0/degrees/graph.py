@@ -0,0 +1,318 @@
+from array import array
+
+# Names of the CSR and component arrays of a Graph
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_people",
+          "components")
+
+
+class Graph():
+    """
+    Compact people/movies graph.
+
+    Person and movie ids are interned to dense integers in the order they
+    are first seen, and the person -> movie and movie -> person adjacency
+    is stored CSR-style in flat array("i") buffers: the movies of person p
+    are person_movies[person_offsets[p]:person_offsets[p + 1]], and the
+    stars of movie m are movie_people[movie_offsets[m]:movie_offsets[m + 1]].
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # Maps dense ints back to the original string ids, and vice versa
+        self.person_ids = []
+        self.person_index = {}
+        self.movie_ids = []
+        self.movie_index = {}
+
+        self.person_offsets = array("i", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("i", [0])
+        self.movie_people = array("i")
+
+        # Connected component label of each person
+        self.components = array("i")
+
+    def intern_person(self, person_id):
+        """
+        Returns the dense int for a person id, assigning a new one
+        if the id has not been seen before.
+        """
+        person = self.person_index.get(person_id)
+        if person is None:
+            person = len(self.person_ids)
+            self.person_index[person_id] = person
+            self.person_ids.append(person_id)
+        return person
+
+    def intern_movie(self, movie_id):
+        """
+        Returns the dense int for a movie id, assigning a new one
+        if the id has not been seen before.
+        """
+        movie = self.movie_index.get(movie_id)
+        if movie is None:
+            movie = len(self.movie_ids)
+            self.movie_index[movie_id] = movie
+            self.movie_ids.append(movie_id)
+        return movie
+
+    def intern_people(self, person_ids):
+        """
+        Interns every person id in an iterable.
+        """
+        index = self.person_index
+        ids = self.person_ids
+        for person_id in person_ids:
+            if person_id not in index:
+                index[person_id] = len(ids)
+                ids.append(person_id)
+
+    def intern_movies(self, movie_ids):
+        """
+        Interns every movie id in an iterable.
+        """
+        index = self.movie_index
+        ids = self.movie_ids
+        for movie_id in movie_ids:
+            if movie_id not in index:
+                index[movie_id] = len(ids)
+                ids.append(movie_id)
+
+    def build(self, edge_people, edge_movies):
+        """
+        Builds both adjacency directions from two parallel sequences of
+        interned (person, movie) credits, dropping repeated credits.
+        """
+        offsets = count_offsets(edge_people, len(self.person_ids))
+        movies = scatter(offsets, edge_people, edge_movies)
+        self.person_offsets, self.person_movies = dedupe(offsets, movies)
+        self.movie_offsets, self.movie_people = transpose(
+            self.person_offsets, self.person_movies, len(self.movie_ids)
+        )
+        self.label_components()
+
+    def label_components(self):
+        """
+        Labels every person with the connected component they belong to,
+        by union-find over the casts of all movies.
+
+        Each label is the interned person at the root of its component,
+        so the labels also form a fully compressed union-find forest.
+        """
+        parent = array("i", range(len(self.person_ids)))
+        offsets = self.movie_offsets
+        stars = self.movie_people
+        for movie in range(len(self.movie_ids)):
+            start, end = offsets[movie], offsets[movie + 1]
+            if start == end:
+                continue
+            root = find(parent, stars[start])
+            for i in range(start + 1, end):
+                other = find(parent, stars[i])
+                if other != root:
+                    parent[other] = root
+        for person in range(len(parent)):
+            parent[person] = find(parent, person)
+        self.components = parent
+
+    def connected(self, person, other):
+        """
+        Returns whether there is any path between two interned people.
+        """
+        components = self.components
+        if components[person] == components[other]:
+            return True
+        # Labels may be one union behind after add_credits
+        return find(components, person) == find(components, other)
+
+    def add_person(self, person_id):
+        """
+        Adds a person to a built graph with no movies yet, returning their
+        interned int. Adding a known person just returns their int.
+        """
+        if person_id in self.person_index:
+            return self.person_index[person_id]
+        self.make_writable()
+        person = self.intern_person(person_id)
+        self.person_offsets.append(self.person_offsets[-1])
+        self.components.append(person)
+        return person
+
+    def add_movie(self, movie_id):
+        """
+        Adds a movie to a built graph with no stars yet, returning its
+        interned int. Adding a known movie just returns its int.
+        """
+        if movie_id in self.movie_index:
+            return self.movie_index[movie_id]
+        self.make_writable()
+        movie = self.intern_movie(movie_id)
+        self.movie_offsets.append(self.movie_offsets[-1])
+        return movie
+
+    def add_credits(self, edge_people, edge_movies):
+        """
+        Merges new interned (person, movie) credits into a built graph.
+
+        Only the rows that gain credits are re-sorted, the rest are copied
+        across in bulk, and component labels are updated by union-find on
+        the new credits alone.
+        """
+        self.make_writable()
+
+        # Link each new credit to someone already in that movie's cast,
+        # or to the first new star of a movie that had none
+        anchors = {}
+        for person, movie in zip(edge_people, edge_movies):
+            if movie not in anchors:
+                start = self.movie_offsets[movie]
+                if start != self.movie_offsets[movie + 1]:
+                    anchors[movie] = self.movie_people[start]
+                else:
+                    anchors[movie] = person
+
+        self.person_offsets, self.person_movies = merge_rows(
+            self.person_offsets, self.person_movies, edge_people, edge_movies
+        )
+        self.movie_offsets, self.movie_people = merge_rows(
+            self.movie_offsets, self.movie_people, edge_movies, edge_people
+        )
+
+        components = self.components
+        for person, movie in zip(edge_people, edge_movies):
+            root = find(components, person)
+            other = find(components, anchors[movie])
+            if root != other:
+                components[root] = other
+
+    def make_writable(self):
+        """
+        Copies any arrays and id tables still mapped read-only from a
+        snapshot into ordinary arrays, lists and dicts so that they can
+        be updated.
+        """
+        for name in ARRAYS:
+            values = getattr(self, name)
+            if isinstance(values, memoryview):
+                copy = array("i")
+                copy.frombytes(values.cast("B"))
+                setattr(self, name, copy)
+        if not isinstance(self.person_ids, list):
+            self.person_ids = list(self.person_ids)
+            self.person_index = self.person_index.copy()
+        if not isinstance(self.movie_ids, list):
+            self.movie_ids = list(self.movie_ids)
+            self.movie_index = self.movie_index.copy()
+
+    def movies_for(self, person):
+        """
+        Returns the interned movies a person starred in.
+        """
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_for(self, movie):
+        """
+        Returns the interned people who starred in a movie.
+        """
+        offsets = self.movie_offsets
+        return self.movie_people[offsets[movie]:offsets[movie + 1]]
+
+
+def find(parent, item):
+    """
+    Returns the root of an item in a union-find forest, halving the
+    path to it along the way.
+    """
+    while parent[item] != item:
+        grandparent = parent[parent[item]]
+        # Only write real changes, so that a fully compressed forest
+        # mapped read-only from a snapshot can still be searched
+        if parent[item] != grandparent:
+            parent[item] = grandparent
+        item = grandparent
+    return item
+
+
+def count_offsets(keys, size):
+    """
+    Returns the CSR offsets array for `size` rows given the row of every
+    entry, so row r spans offsets[r]:offsets[r + 1].
+    """
+    offsets = array("i", bytes(4 * (size + 1)))
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    return offsets
+
+
+def scatter(offsets, keys, values):
+    """
+    Places every value into its row's span of a new CSR index array.
+    """
+    position = offsets[:-1]
+    index = array("i", bytes(4 * len(keys)))
+    for key, value in zip(keys, values):
+        index[position[key]] = value
+        position[key] += 1
+    return index
+
+
+def dedupe(offsets, index):
+    """
+    Sorts every row of a CSR array and removes repeated entries,
+    returning the compacted offsets and index arrays.
+    """
+    new_offsets = array("i", [0])
+    new_index = array("i")
+    for row in range(len(offsets) - 1):
+        new_index.extend(sorted(set(index[offsets[row]:offsets[row + 1]])))
+        new_offsets.append(len(new_index))
+    return new_offsets, new_index
+
+
+def merge_rows(offsets, index, keys, values):
+    """
+    Returns new CSR offsets and index arrays with each value added to the
+    row given by its key, keeping every changed row sorted and unique.
+    """
+    additions = {}
+    for key, value in zip(keys, values):
+        additions.setdefault(key, set()).add(value)
+
+    new_offsets = array("i", [0])
+    new_index = array("i")
+    previous = 0
+    for row in sorted(additions):
+        # Copy the untouched rows before this one, shifted by the growth
+        # so far, then the merged row itself
+        shift = len(new_index) - offsets[previous]
+        new_offsets.extend(offset + shift
+                           for offset in offsets[previous + 1:row + 1])
+        new_index.extend(index[offsets[previous]:offsets[row]])
+        new_index.extend(sorted(
+            additions[row].union(index[offsets[row]:offsets[row + 1]])
+        ))
+        new_offsets.append(len(new_index))
+        previous = row + 1
+
+    shift = len(new_index) - offsets[previous]
+    new_offsets.extend(offset + shift for offset in offsets[previous + 1:])
+    new_index.extend(index[offsets[previous]:])
+    return new_offsets, new_index
+
+
+def transpose(offsets, index, size):
+    """
+    Returns the CSR arrays for the reverse direction of a CSR graph
+    whose entries point into `size` columns.
+    """
+    rows = array("i", bytes(4 * len(index)))
+    for row in range(len(offsets) - 1):
+        for i in range(offsets[row], offsets[row + 1]):
+            rows[i] = row
+    new_offsets = count_offsets(index, size)
+    return new_offsets, scatter(new_offsets, index, rows)
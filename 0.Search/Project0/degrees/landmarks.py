@@ -0,0 +1,76 @@
+import heapq
+from array import array
+
+
+class LandmarkIndex():
+    """
+    Distance oracle built from breadth-first searches out of a few
+    well-connected landmark people.
+
+    For any landmark L and people a and b, the triangle inequality gives
+    |d(L, a) - d(L, b)| <= d(a, b) <= d(L, a) + d(L, b), so taking the best
+    of these over every landmark bounds the degrees of separation between
+    a and b without searching.
+    """
+
+    def __init__(self, landmarks, distances):
+        # Interned landmark people, and for each one an array holding the
+        # distance from it to every interned person (-1 if unreachable)
+        self.landmarks = landmarks
+        self.distances = [array("h", values) for values in distances]
+
+    def profile(self, person):
+        """
+        Returns the distances from every landmark to an interned person.
+        """
+        return [distances[person] for distances in self.distances]
+
+    def bounds(self, person, other):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        two interned people who are known to be connected.
+
+        The upper bound is None if no landmark reaches both of them.
+        """
+        lower = 0
+        upper = None
+        for distances in self.distances:
+            a = distances[person]
+            b = distances[other]
+            if a == -1 or b == -1:
+                continue
+            lower = max(lower, abs(a - b))
+            if upper is None or a + b < upper:
+                upper = a + b
+        return lower, upper
+
+    def lower_bound(self, person, profile):
+        """
+        Returns a lower bound on the distance from an interned person to
+        the person whose landmark profile is given.
+        """
+        lower = 0
+        for distances, b in zip(self.distances, profile):
+            a = distances[person]
+            if a != -1 and b != -1 and abs(a - b) > lower:
+                lower = abs(a - b)
+        return lower
+
+
+def pick_landmarks(graph, k):
+    """
+    Returns the k interned people with the most co-star credits, counting
+    the full cast of every movie they starred in.
+    """
+    person_offsets = graph.person_offsets
+    person_movies = graph.person_movies
+    movie_offsets = graph.movie_offsets
+
+    def degree(person):
+        total = 0
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            total += movie_offsets[movie + 1] - movie_offsets[movie]
+        return total
+
+    return heapq.nlargest(k, range(len(graph.person_ids)), key=degree)
@@ -0,0 +1,143 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+
+class NameIndex():
+    """
+    Search index over lower-cased names supporting prefix lookups and
+    typo-tolerant lookups through an inverted index of letter trigrams.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # Every distinct name, in the order it was added and with None
+        # where one was removed, and the names sorted for prefix lookups
+        self.names = []
+        self.sorted_names = []
+
+        # Maps each trigram to the positions in `names` containing it
+        self.trigrams = {}
+
+    def build(self, names):
+        """
+        Replaces the index contents with the given lower-cased names.
+        """
+        self.clear()
+        self.names = list(names)
+        self.sorted_names = sorted(self.names)
+
+        # Collect plain lists first, which grow faster than arrays
+        postings = defaultdict(list)
+        for position, name in enumerate(self.names):
+            for trigram in set(trigrams(name)):
+                postings[trigram].append(position)
+        self.trigrams = {
+            trigram: array("i", positions)
+            for trigram, positions in postings.items()
+        }
+
+    def add(self, name):
+        """
+        Adds one lower-cased name to the index, if not already present.
+        """
+        position = bisect_left(self.sorted_names, name)
+        if position < len(self.sorted_names) and \
+                self.sorted_names[position] == name:
+            return
+        self.make_writable()
+        self.sorted_names.insert(position, name)
+        self.names.append(name)
+        self.index_trigrams(len(self.names) - 1, name)
+
+    def remove(self, name):
+        """
+        Removes a lower-cased name from the index, if present.
+
+        Its slot in `names` is left as None so that the positions of the
+        other names stay valid.
+        """
+        position = bisect_left(self.sorted_names, name)
+        if position == len(self.sorted_names) or \
+                self.sorted_names[position] != name:
+            return
+        self.make_writable()
+        del self.sorted_names[position]
+        slot = self.names.index(name)
+        self.names[slot] = None
+        for trigram in set(trigrams(name)):
+            self.trigrams[trigram].remove(slot)
+
+    def make_writable(self):
+        """
+        Copies an index still mapped read-only from a snapshot into
+        ordinary lists and arrays so that it can be updated.
+        """
+        if not isinstance(self.names, list):
+            self.names = list(self.names)
+            self.sorted_names = list(self.sorted_names)
+            self.trigrams = {
+                trigram: array("i", positions)
+                for trigram, positions in self.trigrams.copy().items()
+            }
+
+    def index_trigrams(self, position, name):
+        for trigram in set(trigrams(name)):
+            postings = self.trigrams.get(trigram)
+            if postings is None:
+                postings = self.trigrams[trigram] = array("i")
+            postings.append(position)
+
+    def prefix(self, prefix, limit=None):
+        """
+        Returns the names starting with `prefix`, in sorted order.
+        """
+        matches = []
+        position = bisect_left(self.sorted_names, prefix)
+        while position < len(self.sorted_names) and \
+                self.sorted_names[position].startswith(prefix):
+            if limit is not None and len(matches) >= limit:
+                break
+            matches.append(self.sorted_names[position])
+            position += 1
+        return matches
+
+    def search(self, query, limit=10, min_score=0.4):
+        """
+        Returns up to `limit` (name, score) pairs for a lower-cased query,
+        best first.
+
+        Exact matches score 1, then names starting with the query, then
+        other names by the Dice similarity of their trigrams to the
+        query's, ignoring any scoring below `min_score`.
+        """
+        scores = {}
+        for name in self.prefix(query, limit):
+            scores[name] = 1.0 if name == query else 0.99
+
+        query_trigrams = set(trigrams(query))
+        shared = {}
+        for trigram in query_trigrams:
+            for position in self.trigrams.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        for position, count in shared.items():
+            name = self.names[position]
+            if name in scores:
+                continue
+            score = 2 * count / (len(query_trigrams) + len(set(trigrams(name))))
+            if score >= min_score:
+                scores[name] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+def trigrams(name):
+    """
+    Returns the letter trigrams of a name, padded so that its first and
+    last letters also start and end a trigram.
+    """
+    padded = f"  {name} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
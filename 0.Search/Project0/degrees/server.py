@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import degrees
+from util import latency_summary
+
+# Number of recent request latencies kept per endpoint for /stats
+LATENCY_WINDOW = 10000
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve degrees of separation queries over HTTP."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes for searches (default: all CPUs)"
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=4096,
+        help="number of recent path results to keep"
+    )
+    args = parser.parse_args()
+
+    print("Loading data...")
+    degrees.load_data(args.directory)
+    print("Data loaded.")
+
+    # Workers are forked after loading so they share the graph
+    # copy-on-write instead of each loading their own
+    if "fork" in multiprocessing.get_all_start_methods():
+        executor = ProcessPoolExecutor(
+            args.workers, mp_context=multiprocessing.get_context("fork")
+        )
+    else:
+        executor = ThreadPoolExecutor(args.workers)
+
+    service = Service(executor, args.cache_size)
+    with executor:
+        asyncio.run(service.serve(args.host, args.port))
+
+
+class LRUCache():
+    """
+    Mapping that keeps only its `capacity` most recently used entries.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the cached value for a key, or None if it is not cached.
+        """
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+
+class Service():
+    """
+    HTTP/JSON front end answering queries against the loaded graph.
+    """
+
+    def __init__(self, executor, cache_size):
+        self.executor = executor
+        self.cache = LRUCache(cache_size)
+        self.latencies = {}
+        self.routes = {
+            "/path": self.path,
+            "/people": self.people,
+            "/stats": self.stats,
+        }
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        """
+        Answers the single request on a connection and closes it.
+        """
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            status, body = await self.dispatch(request)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode("ascii") + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        """
+        Routes a raw request line, returning a (status, JSON body) pair.
+        """
+        parts = request.decode("latin-1").split()
+        if len(parts) != 3:
+            return 400, {"error": "Malformed request."}
+        method, target, _ = parts
+        if method != "GET":
+            return 405, {"error": "Only GET is supported."}
+
+        url = urlsplit(target)
+        route = self.routes.get(url.path)
+        if route is None:
+            return 404, {"error": f"No such endpoint: {url.path}"}
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        start = time.perf_counter()
+        try:
+            status, body = await route(query)
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+        latencies = self.latencies.setdefault(
+            url.path, deque(maxlen=LATENCY_WINDOW)
+        )
+        latencies.append(time.perf_counter() - start)
+        return status, body
+
+    async def path(self, query):
+        """
+        GET /path?source=...&target=... with person ids or names.
+        """
+        loop = asyncio.get_running_loop()
+        people = {}
+        for side in ("source", "target"):
+            text = query.get(side)
+            if not text:
+                return 400, {"error": f"Missing {side}."}
+            person_id = degrees.lookup_person(text)
+            if person_id is None:
+                return 404, {
+                    "error": f"Person not found: {text}",
+                    "candidates": await loop.run_in_executor(
+                        self.executor, candidates, text
+                    ),
+                }
+            people[side] = person_id
+        source, target = people["source"], people["target"]
+
+        path = self.cache.get((source, target))
+        if path is None:
+            path = await loop.run_in_executor(
+                self.executor, degrees.shortest_path, source, target
+            )
+            # Cache unconnected pairs too, as an empty result
+            self.cache.put((source, target), path if path is not None else ())
+        if path == ():
+            path = None
+
+        body = {"source": source, "target": target}
+        if path is None:
+            body["degrees"] = None
+            body["path"] = None
+        else:
+            body["degrees"] = len(path)
+            body["path"] = [
+                {
+                    "movie_id": movie_id,
+                    "title": degrees.movies[movie_id]["title"],
+                    "person_id": person_id,
+                    "name": degrees.people[person_id]["name"],
+                }
+                for movie_id, person_id in path
+            ]
+        return 200, body
+
+    async def people(self, query):
+        """
+        GET /people?name=...&limit=... for ranked name matches.
+        """
+        name = query.get("name")
+        if not name:
+            return 400, {"error": "Missing name."}
+        try:
+            limit = int(query.get("limit", 10))
+        except ValueError:
+            return 400, {"error": "limit must be an integer."}
+        # Fuzzy matching scans the trigram index, so keep it off the loop
+        loop = asyncio.get_running_loop()
+        matches = await loop.run_in_executor(
+            self.executor, candidates, name, limit
+        )
+        return 200, {"candidates": matches}
+
+    async def stats(self, query):
+        """
+        GET /stats for request latency percentiles and cache counters.
+        """
+        endpoints = {}
+        for endpoint, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            endpoints[endpoint] = {
+                "count": len(ordered),
+                **latency_summary(ordered),
+            }
+        return 200, {
+            "endpoints": endpoints,
+            "cache": {
+                "size": len(self.cache.entries),
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            },
+        }
+
+
+def candidates(name, limit=5):
+    """
+    Returns JSON-ready name matches for a query.
+    """
+    return [
+        {"person_id": person_id, "name": match, "birth": birth}
+        for person_id, match, birth in degrees.search_people(name, limit)
+    ]
+
+
+if __name__ == "__main__":
+    main()
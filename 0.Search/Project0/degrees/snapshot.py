@@ -0,0 +1,123 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+# Bump whenever the layout below or the sections written change
+SNAPSHOT_VERSION = 5
+
+MAGIC = b"DEGSNAP\0"
+
+# magic, version, number of sections
+HEADER = struct.Struct("<8sII")
+
+# name, array typecode ("B" for raw bytes), file offset, number of items
+SECTION = struct.Struct("<24sc7xQQ")
+
+
+def source_stats(directory, filenames):
+    """
+    Returns the (filename, size, mtime) of every source CSV, which a
+    snapshot must match to be considered up to date.
+    """
+    stats = []
+    for filename in filenames:
+        stat = os.stat(os.path.join(directory, filename))
+        stats.append((filename, stat.st_size, stat.st_mtime_ns))
+    return stats
+
+
+def save(path, sources, metadata, sections):
+    """
+    Writes named sections, each an array or a bytes object, and a JSON
+    metadata dict to `path`.
+
+    Nothing in the file is ever executed on loading, unlike a pickle.
+    The file is written to a uniquely named temporary file next to its
+    final location and then renamed over it, so a reader never sees a
+    half-written snapshot and concurrent writers never share one.
+    """
+    header = json.dumps({"sources": sources, "metadata": metadata})
+    sections = {"metadata": header.encode("utf-8"), **sections}
+
+    # Lay the sections out after the section table, each aligned to 8
+    # bytes so that any typecode can be cast from the mapping in place
+    entries = []
+    offset = HEADER.size + SECTION.size * len(sections)
+    for name, values in sections.items():
+        offset += -offset % 8
+        typecode = values.typecode if hasattr(values, "typecode") else "B"
+        size = len(values) * (values.itemsize if typecode != "B" else 1)
+        entries.append((name, typecode, offset, len(values)))
+        offset += size
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(entries)))
+            for name, typecode, offset, count in entries:
+                f.write(SECTION.pack(name.encode("ascii"),
+                                     typecode.encode("ascii"), offset, count))
+            for (name, typecode, offset, count), values in zip(
+                    entries, sections.values()):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(values if typecode == "B" else values.tobytes())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load(path, sources):
+    """
+    Memory-maps the snapshot at `path` and returns its (metadata,
+    sections), with every section a memoryview cast to its typecode.
+
+    The sections are left in the mapping, so only pages that are
+    actually read get loaded.
+
+    Returns None if there is no snapshot or it was written by another
+    version or from different sources.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != SNAPSHOT_VERSION or \
+            len(data) < HEADER.size + SECTION.size * count:
+        return None
+
+    view = memoryview(data)
+    sections = {}
+    for i in range(count):
+        name, typecode, offset, length = SECTION.unpack_from(
+            data, HEADER.size + SECTION.size * i
+        )
+        typecode = typecode.decode("ascii")
+        itemsize = struct.calcsize(typecode)
+        if offset + itemsize * length > len(data):
+            return None
+        values = view[offset:offset + itemsize * length]
+        if typecode != "B":
+            values = values.cast(typecode)
+        sections[name.rstrip(b"\0").decode("ascii")] = values
+
+    try:
+        header = json.loads(str(sections.pop("metadata"), "utf-8"))
+    except (KeyError, ValueError):
+        return None
+    # JSON has no tuples, so compare the sources as lists
+    if header["sources"] != [list(source) for source in sources]:
+        return None
+    return header["metadata"], sections
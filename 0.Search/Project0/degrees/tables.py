@@ -0,0 +1,155 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+
+def pack_strings(strings):
+    """
+    Returns (offsets, data) packing strings into one UTF-8 buffer, where
+    string i is data[offsets[i]:offsets[i + 1]].
+    """
+    offsets = array("q", [0])
+    chunks = []
+    size = 0
+    for string in strings:
+        chunk = string.encode("utf-8")
+        chunks.append(chunk)
+        size += len(chunk)
+        offsets.append(size)
+    return offsets, b"".join(chunks)
+
+
+def sorted_order(strings):
+    """
+    Returns the positions of a sequence of strings, sorted by string.
+    """
+    return array("i", sorted(range(len(strings)), key=strings.__getitem__))
+
+
+class StringTable(Sequence):
+    """
+    Read-only sequence of strings packed by pack_strings, decoded only
+    when they are looked up.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class SortedView(Sequence):
+    """
+    Read-only sequence of the strings of a table in the order of `order`,
+    a sequence of positions in the table.
+    """
+
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.table[self.order[i]]
+
+
+class TableIndex(Mapping):
+    """
+    Read-only mapping from each string of a table to its position, found
+    by binary search over the positions sorted by string.
+    """
+
+    def __init__(self, table, order):
+        self.table = table
+        self.sorted = SortedView(table, order)
+
+    def __getitem__(self, key):
+        i = bisect_left(self.sorted, key)
+        if i < len(self.sorted) and self.sorted[i] == key:
+            return self.sorted.order[i]
+        raise KeyError(key)
+
+    def copy(self):
+        """
+        Returns the mapping as an ordinary dict.
+        """
+        return {key: i for i, key in enumerate(self.table)}
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+
+class GroupTable(Mapping):
+    """
+    Read-only mapping from the keys of a TableIndex to rows of a CSR
+    array, the row of position i being values[offsets[i]:offsets[i + 1]],
+    optionally passed through `convert`.
+    """
+
+    def __init__(self, index, offsets, values, convert=None):
+        self.index = index
+        self.offsets = offsets
+        self.values = values
+        self.convert = convert
+
+    def __getitem__(self, key):
+        return self.row(self.index[key])
+
+    def row(self, i):
+        row = self.values[self.offsets[i]:self.offsets[i + 1]]
+        return self.convert(row) if self.convert else row
+
+    def copy(self):
+        """
+        Returns the mapping as an ordinary dict.
+        """
+        return {key: self.row(i) for i, key in enumerate(self.index.table)}
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+
+class RecordTable(Mapping):
+    """
+    Read-only mapping from the keys of an index to dicts of fields, each
+    field read from its own table at the key's position.
+    """
+
+    def __init__(self, index, fields):
+        self.index = index
+        self.fields = fields
+
+    def __getitem__(self, key):
+        return self.record(self.index[key])
+
+    def record(self, i):
+        return {field: table[i] for field, table in self.fields.items()}
+
+    def copy(self):
+        """
+        Returns the mapping as an ordinary dict.
+        """
+        return {key: self.record(i) for i, key in enumerate(self.index.table)}
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -36,3 +39,58 @@ class QueueFrontier(StackFrontier):
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
             return node
+
+
+class DequeFrontier():
+    """
+    Queue frontier backed by a deque, with a companion index of the
+    states currently queued so that add, remove and contains_state
+    all run in constant time.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.popleft()
+            count = self.states[node.state] - 1
+            if count:
+                self.states[node.state] = count
+            else:
+                del self.states[node.state]
+            return node
+
+
+def percentile(ordered, percent):
+    """
+    Returns the nearest-rank percentile of a sorted, non-empty list.
+    """
+    rank = max(0, -(-percent * len(ordered) // 100) - 1)
+    return ordered[rank]
+
+
+def latency_summary(ordered):
+    """
+    Returns the p50, p90, p99 and maximum of a sorted, non-empty list of
+    timings in seconds, in milliseconds.
+    """
+    return {
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p90_ms": percentile(ordered, 90) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
@@ -0,0 +1,145 @@
+import time
+
+import tictactoe as ttt
+
+# Measure the whole search rather than opening book lookups or a
+# search cut short by the time limit
+ttt.use_book = False
+ttt.time_limit = None
+
+# Move ordering and search variants compared by compare_ordering, as
+# (name, ordering, use_pvs)
+VARIANTS = [
+    ("unordered alpha-beta", "none", False),
+    ("static order", "static", False),
+    ("killers + history", "full", False),
+    ("killers + history + PVS", "full", True),
+]
+
+# Searches the variants are compared on, as (name, rows, cols, k, depth),
+# each deepening iteratively from the empty board up to depth (None for
+# the end of the game)
+ORDERING_SEARCHES = [
+    ("3x3 solve", 3, 3, 3, None),
+    ("4x4 to depth 7", 4, 4, 4, 7),
+    ("5x5, k=4 to depth 5", 5, 5, 4, 5),
+]
+
+
+def main():
+    positions = reachable_positions()
+    print(f"{len(positions)} reachable positions, "
+          f"{sum(not ttt.terminal(board) for board in positions)} to move")
+    print()
+    print(f"{'scenario':<28}{'plain':>10}{'symmetry':>10}{'saved':>8}"
+          f"{'plain s':>10}{'sym s':>8}")
+
+    scenarios = [
+        ("opening move, cold", opening_move),
+        ("every position, cold", every_position_cold),
+        ("every position, warm", every_position_warm),
+    ]
+    for name, scenario in scenarios:
+        plain_nodes, plain_seconds = count_nodes(scenario, positions, False)
+        sym_nodes, sym_seconds = count_nodes(scenario, positions, True)
+        saved = 1 - sym_nodes / plain_nodes
+        print(f"{name:<28}{plain_nodes:>10}{sym_nodes:>10}{saved:>8.1%}"
+              f"{plain_seconds:>10.3f}{sym_seconds:>8.3f}")
+
+    print()
+    print(f"{'search':<22}{'variant':<26}{'nodes':>10}{'saved':>8}"
+          f"{'seconds':>9}")
+    for name, rows, cols, k, depth in ORDERING_SEARCHES:
+        for variant, nodes, saved, seconds in compare_ordering(rows, cols, k,
+                                                               depth):
+            print(f"{name:<22}{variant:<26}{nodes:>10}{saved:>8.1%}"
+                  f"{seconds:>9.3f}")
+            name = ""
+
+
+def reachable_positions():
+    """
+    Returns every board reachable from the empty board, terminal or not.
+    """
+    seen = set()
+    positions = []
+    frontier = [ttt.initial_state()]
+    while frontier:
+        board = frontier.pop()
+        key = ttt.encode(board)
+        if key in seen:
+            continue
+        seen.add(key)
+        positions.append(board)
+        if not ttt.terminal(board):
+            for action in ttt.actions(board):
+                frontier.append(ttt.result(board, action))
+    return positions
+
+
+def count_nodes(scenario, positions, symmetry):
+    """
+    Returns the number of nodes searched and the seconds taken by a
+    scenario, with symmetry reduction on or off.
+    """
+    previous = ttt.use_symmetry
+    ttt.use_symmetry = symmetry
+    ttt.clear_table()
+    try:
+        start = time.perf_counter()
+        scenario(positions)
+        seconds = time.perf_counter() - start
+        stats = ttt.table_stats
+        return stats["hits"] + stats["misses"], seconds
+    finally:
+        ttt.use_symmetry = previous
+        ttt.clear_table()
+
+
+def compare_ordering(rows, cols, k, depth):
+    """
+    Returns (variant, nodes, fraction saved, seconds) for every variant
+    searching a board from empty, each with a cold table, where the
+    fraction saved is against the first variant.
+    """
+    results = []
+    previous = ttt.ordering, ttt.use_pvs
+    ttt.configure(rows, cols, k)
+    try:
+        for variant, ordering, use_pvs in VARIANTS:
+            ttt.ordering, ttt.use_pvs = ordering, use_pvs
+            ttt.clear_table()
+            ttt.reset_ordering()
+            start = time.perf_counter()
+            move = 0
+            for iteration in range(1, (depth or ttt.SIZE) + 1):
+                move, _ = ttt.best_move(0, 0, iteration, move)
+            seconds = time.perf_counter() - start
+            stats = ttt.table_stats
+            nodes = stats["hits"] + stats["misses"]
+            saved = 1 - nodes / results[0][1] if results else 0
+            results.append((variant, nodes, saved, seconds))
+    finally:
+        ttt.ordering, ttt.use_pvs = previous
+        ttt.configure()
+    return results
+
+
+def opening_move(positions):
+    ttt.minimax(ttt.initial_state())
+
+
+def every_position_cold(positions):
+    # Keep the counts running across positions while emptying the table
+    for board in positions:
+        ttt.transposition_table.clear()
+        ttt.minimax(board)
+
+
+def every_position_warm(positions):
+    for board in positions:
+        ttt.minimax(board)
+
+
+if __name__ == "__main__":
+    main()
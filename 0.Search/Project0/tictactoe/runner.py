@@ -1,9 +1,60 @@
 import pygame
 import sys
+import threading
 import time
+import traceback
 
 import tictactoe as ttt
 
+# Usage: python runner.py [rows cols [k]]
+if len(sys.argv) not in (1, 3, 4):
+    sys.exit("Usage: python runner.py [rows cols [k]]")
+if len(sys.argv) > 1:
+    ttt.configure(*(int(arg) for arg in sys.argv[1:]))
+
+
+class AIWorker():
+    """
+    Computes the AI's move on a background thread, so that the window
+    keeps redrawing while it thinks.
+    """
+
+    def __init__(self, board):
+        self.move = None
+        self.error = None
+        self.done = False
+        # Set by cancel(), stopping this worker's search and no other
+        self.cancelled = threading.Event()
+        self.started = time.time()
+        self.thread = threading.Thread(target=self.run, args=(board,),
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self, board):
+        # Report a failed search instead of leaving the game waiting on it
+        try:
+            self.move = ttt.minimax(board, self.cancelled)
+        except Exception as error:
+            traceback.print_exc()
+            self.error = error
+        finally:
+            self.done = True
+
+    def cancel(self):
+        """
+        Stops the search early and waits for the thread to finish.
+        """
+        ttt.cancel(self.cancelled)
+        self.thread.join()
+
+
+# Seconds the AI always appears to think, however quick its move
+MIN_THINKING = 0.5
+
+# Hand the GIL back to the drawing loop sooner than the default 5ms while
+# the AI thread searches, so frames keep coming on time
+sys.setswitchinterval(0.001)
+
 pygame.init()
 size = width, height = 600, 400
 
@@ -15,16 +66,23 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+
+# Fit the board between the title and the "Play Again" button
+tile_size = min(80, (height - 120) // ttt.ROWS, (width - 40) // ttt.COLS)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
+
+clock = pygame.time.Clock()
 
 user = None
 board = ttt.initial_state()
-ai_turn = False
+ai_worker = None
 
 while True:
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            if ai_worker is not None:
+                ai_worker.cancel()
             sys.exit()
 
     screen.fill(black)
@@ -67,13 +125,12 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (ttt.COLS / 2 * tile_size),
+                       height / 2 - (ttt.ROWS / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(ttt.ROWS):
             row = []
-            for j in range(3):
+            for j in range(ttt.COLS):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -101,6 +158,8 @@ while True:
                 title = f"Game Over: {winner} wins."
         elif user == player:
             title = f"Play as {user}"
+        elif ai_worker is not None and ai_worker.error is not None:
+            title = f"Computer error: {ai_worker.error}"
         else:
             title = f"Computer thinking..."
         title = largeFont.render(title, True, white)
@@ -110,20 +169,19 @@ while True:
 
         # Check for AI move
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if ai_worker is None:
+                ai_worker = AIWorker(board)
+            elif ai_worker.done and ai_worker.error is None and \
+                    time.time() - ai_worker.started >= MIN_THINKING:
+                board = ttt.result(board, ai_worker.move)
+                ai_worker = None
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
+            for i in range(ttt.ROWS):
+                for j in range(ttt.COLS):
                     if board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse):
                         board = ttt.result(board, (i, j))
 
@@ -141,6 +199,9 @@ while True:
                     time.sleep(0.2)
                     user = None
                     board = ttt.initial_state()
-                    ai_turn = False
+                    ai_worker = None
 
     pygame.display.flip()
+
+    # Cap the frame rate, which also leaves the AI thread time to search
+    clock.tick(60)
@@ -0,0 +1,196 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import tictactoe as ttt
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play tictactoe games without the GUI and time the AI."
+    )
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--opponent", choices=["ai", "random"], default="ai",
+                        help="who plays against the AI")
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int, default=3)
+    parser.add_argument("-k", type=int, default=None,
+                        help="pieces in a row needed to win")
+    parser.add_argument(
+        "--time-limit", type=float, default=None,
+        help="seconds per AI move (default: search to the end of the game)"
+    )
+    parser.add_argument("--no-book", action="store_true",
+                        help="search every move instead of using the book")
+    parser.add_argument("--cold", action="store_true",
+                        help="empty the transposition table before each game")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes (default: all CPUs)"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    settings = {"rows": args.rows, "cols": args.cols, "k": args.k,
+                "time_limit": args.time_limit, "book": not args.no_book,
+                "cold": args.cold}
+    summary = play_games(args.games, args.opponent, settings, args.workers,
+                         args.seed)
+    print(json.dumps(summary), flush=True)
+    if summary["mismatches"]:
+        sys.exit(f"{summary['mismatches']} games fell short of perfect play")
+
+
+def setup(settings):
+    """
+    Configures the engine in a worker process.
+    """
+    ttt.configure(settings["rows"], settings["cols"], settings["k"])
+    ttt.time_limit = settings["time_limit"]
+    ttt.use_book = settings["book"]
+    ttt.instrument = True
+    # Build the book here so that it is not timed as part of a move
+    if ttt.use_book and ttt.SIZE <= ttt.BOOK_MAX_CELLS:
+        ttt.load_book()
+
+
+def play_games(num_games, opponent, settings, workers=None, seed=0):
+    """
+    Plays games across a pool of processes and returns a summary of the
+    results, move latencies, nodes searched and throughput.
+    """
+    setup(settings)
+    expected = perfect_value(settings)
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = None
+    workers = workers or os.cpu_count()
+    jobs = [(game, opponent, settings, seed) for game in range(num_games)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=setup,
+                             initargs=(settings,)) as executor:
+        games = list(executor.map(play_game, jobs))
+    seconds = time.perf_counter() - start
+
+    outcomes = {ttt.X: 0, ttt.O: 0, None: 0}
+    ai_results = {"wins": 0, "draws": 0, "losses": 0}
+    latencies = []
+    nodes = []
+    cutoffs = 0
+    cache_hits = 0
+    mismatches = 0
+    for game in games:
+        outcomes[game["winner"]] += 1
+        for move in game["moves"]:
+            latencies.append(move["seconds"])
+            nodes.append(move["nodes"])
+            cutoffs += move["cutoffs"]
+            cache_hits += move["cache_hits"]
+        value = {ttt.X: 1, ttt.O: -1, None: 0}[game["winner"]]
+        if opponent == "random":
+            sign = 1 if game["ai"] == ttt.X else -1
+            ai_results[{1: "wins", 0: "draws", -1: "losses"}[sign * value]] += 1
+            # A perfect player never does worse than the game's value
+            if expected is not None and sign * value < sign * expected:
+                mismatches += 1
+        elif expected is not None and value != expected:
+            mismatches += 1
+
+    summary = {
+        "benchmark": "selfplay",
+        "opponent": opponent,
+        **settings,
+        "k": ttt.K,
+        "workers": workers,
+        "games": len(games),
+        "x_wins": outcomes[ttt.X],
+        "o_wins": outcomes[ttt.O],
+        "draws": outcomes[None],
+        "perfect_value": expected,
+        "mismatches": mismatches,
+        "seconds": seconds,
+        "games_per_second": len(games) / seconds if seconds else None,
+        "ai_moves": len(latencies),
+        "moves_per_second": len(latencies) / seconds if seconds else None,
+        "nodes": sum(nodes),
+        "nodes_per_move": sum(nodes) / len(nodes) if nodes else None,
+        "cutoffs": cutoffs,
+        "cache_hits": cache_hits,
+        **summarize(latencies),
+        "python": platform.python_version(),
+    }
+    if opponent == "random":
+        summary.update({f"ai_{key}": count
+                        for key, count in ai_results.items()})
+    return summary
+
+
+def perfect_value(settings):
+    """
+    Returns the value of the empty board under perfect play (1 if X wins,
+    -1 if O wins, 0 for a draw) when the AI plays perfectly under these
+    settings, or None when its moves are limited by time.
+    """
+    if settings["time_limit"] is not None and not (
+            settings["book"] and ttt.SIZE <= ttt.BOOK_MAX_CELLS):
+        return None
+    value = ttt.position_value(0, 0)
+    ttt.clear_table()
+    return value
+
+
+def play_game(job):
+    """
+    Plays one game and returns its winner and the search stats of every
+    AI move.
+    """
+    game, opponent, settings, seed = job
+    rng = random.Random(seed * 1000003 + game)
+    if settings["cold"]:
+        ttt.clear_table()
+
+    # Against a random player the AI alternates sides
+    ai = ttt.X if game % 2 == 0 else ttt.O
+    board = ttt.initial_state()
+    moves = []
+    while not ttt.terminal(board):
+        current = ttt.player(board)
+        if opponent == "random" and current != ai:
+            action = rng.choice(sorted(ttt.actions(board)))
+        else:
+            action = ttt.minimax(board)
+            moves.append({"player": current, **ttt.last_stats.as_dict()})
+        board = ttt.result(board, action)
+    return {"ai": ai, "winner": ttt.winner(board), "moves": moves}
+
+
+def summarize(latencies):
+    """
+    Returns latency percentiles in milliseconds for a list of timings.
+    """
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def percentile(percent):
+        return ordered[max(0, -(-percent * len(ordered) // 100) - 1)]
+
+    return {
+        "p50_ms": percentile(50) * 1000,
+        "p90_ms": percentile(90) * 1000,
+        "p99_ms": percentile(99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -2,123 +2,342 @@
 Tic Tac Toe Player
 """
 
+import hashlib
 import math
-import copy
+import os
+import struct
+import tempfile
+import time
+from array import array
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Bitboard engine: a position is a pair of masks (x, o), one per player,
+# where bit COLS * i + j is set if that player holds cell (i, j). The
+# board is ROWS x COLS and a player needs K in a row to win; configure()
+# sets these and everything derived from them, starting from 3x3.
+ROWS = COLS = K = SIZE = FULL = 0
+CELLS = []
+
+# Masks of every K-cell window along a row, column or diagonal
+LINES = []
+
+# Cell bits ordered by how many windows they lie on, then from the
+# center outwards: center, corners, edges on 3x3
+STATIC_ORDER = []
+
+# Evaluation weight of a window holding n pieces of one player only, and
+# the score of a won game, larger than any evaluation
+WEIGHTS = []
+WIN = 1
+
+# Masks are transformed under a symmetry in chunks of this many bits
+CHUNK_BITS = 9
+
+
+def configure(rows=3, cols=3, k=None):
+    """
+    Sets the board to rows x cols with k in a row to win (by default the
+    shorter side), and clears everything cached for the old board.
+    """
+    global ROWS, COLS, K, SIZE, FULL, CELLS, LINES, STATIC_ORDER
+    global WEIGHTS, WIN, SYMMETRIES, INVERSES, opening_book
+    if k is None:
+        k = min(rows, cols)
+    if rows < 1 or cols < 1 or not 1 <= k <= max(rows, cols):
+        raise ValueError("Invalid board size")
+
+    ROWS, COLS, K = rows, cols, k
+    SIZE = rows * cols
+    FULL = (1 << SIZE) - 1
+    CELLS = [(i, j) for i in range(rows) for j in range(cols)]
+
+    LINES = []
+    for i, j in CELLS:
+        for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+            if 0 <= end_i < rows and 0 <= end_j < cols:
+                LINES.append(sum(1 << (cols * (i + di * n) + j + dj * n)
+                                 for n in range(k)))
+
+    center_i, center_j = (rows - 1) / 2, (cols - 1) / 2
+
+    def priority(cell):
+        i, j = cell
+        bit = 1 << (cols * i + j)
+        return (-sum(1 for line in LINES if line & bit),
+                abs(i - center_i) + abs(j - center_j), cell)
+
+    STATIC_ORDER = [1 << (cols * i + j) for i, j in sorted(CELLS, key=priority)]
+
+    WEIGHTS = [4 ** n for n in range(k + 1)]
+    WIN = len(LINES) * WEIGHTS[k] or 1
+
+    SYMMETRIES = [transform_tables(symmetry)
+                  for symmetry in board_symmetries(rows, cols)]
+    INVERSES = [
+        next(t for t, inverse in enumerate(SYMMETRIES)
+             if all(transform(inverse, transform(tables, 1 << c)) == 1 << c
+                    for c in range(SIZE)))
+        for tables in SYMMETRIES
+    ]
+
+    clear_table()
+    reset_ordering()
+    opening_book = None
+
 
 def initial_state():
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * COLS for _ in range(ROWS)]
+
+
+def encode(board):
+    """
+    Returns the (x, o) bitboards for a list-of-lists board.
+    """
+    x = o = 0
+    bit = 1
+    for row in board:
+        for cell in row:
+            if cell == X:
+                x |= bit
+            elif cell == O:
+                o |= bit
+            bit <<= 1
+    return x, o
+
+
+def decode(x, o):
+    """
+    Returns the list-of-lists board for a pair of bitboards.
+    """
+    return [[X if x >> (COLS * i + j) & 1 else O if o >> (COLS * i + j) & 1
+             else EMPTY for j in range(COLS)] for i in range(ROWS)]
+
+
+def bit_player(x, o):
+    """
+    Returns the player to move on a bitboard position.
+    """
+    return X if x.bit_count() <= o.bit_count() else O
+
+
+def bit_moves(x, o):
+    """
+    Yields the bit of every empty cell, lowest cell first.
+    """
+    empty = FULL & ~(x | o)
+    while empty:
+        bit = empty & -empty
+        yield bit
+        empty ^= bit
+
+
+def bit_winner(x, o):
+    """
+    Returns X or O if that player holds a whole line, otherwise None.
+    """
+    for line in LINES:
+        if x & line == line:
+            return X
+        if o & line == line:
+            return O
+    return None
+
+
+def bit_utility(x, o):
+    """
+    Returns 1 if X holds a line, -1 if O does, 0 otherwise.
+    """
+    for line in LINES:
+        if x & line == line:
+            return 1
+        if o & line == line:
+            return -1
+    return 0
+
+
+def bit_terminal(x, o):
+    """
+    Returns True if a player holds a line or the board is full.
+    """
+    return (x | o) == FULL or bit_winner(x, o) is not None
+
+
+def won(mask):
+    """
+    Returns True if the pieces in a mask complete a line.
+    """
+    for line in LINES:
+        if mask & line == line:
+            return True
+    return False
+
+
+def evaluate(mine, theirs):
+    """
+    Returns a heuristic score, strictly between -WIN and WIN, of a
+    position with no winner for the player holding `mine`, rewarding
+    lines still open to only one player, the more so the more of it
+    they hold.
+    """
+    score = 0
+    for line in LINES:
+        own = mine & line
+        other = theirs & line
+        if own and not other:
+            score += WEIGHTS[own.bit_count()]
+        elif other and not own:
+            score -= WEIGHTS[other.bit_count()]
+    return score
+
+
+def board_symmetries(rows, cols):
+    """
+    Returns the symmetries of a rows x cols board, each a function from
+    cell (i, j) to cell (i, j): the 8 rotations and reflections of the
+    square (the dihedral group) or the 4 of a rectangle.
+    """
+    last_i, last_j = rows - 1, cols - 1
+    symmetries = [
+        lambda i, j: (i, j),
+        lambda i, j: (last_i - i, last_j - j),
+        lambda i, j: (i, last_j - j),
+        lambda i, j: (last_i - i, j),
+    ]
+    if rows == cols:
+        symmetries += [
+            lambda i, j: (j, last_i - i),
+            lambda i, j: (last_j - j, i),
+            lambda i, j: (j, i),
+            lambda i, j: (last_j - j, last_i - i),
+        ]
+    return symmetries
+
+
+def transform_tables(symmetry):
+    """
+    Returns lookup tables mapping each CHUNK_BITS-bit chunk of a mask to
+    the image of that chunk under a symmetry.
+    """
+    tables = []
+    for shift in range(0, SIZE, CHUNK_BITS):
+        width = min(CHUNK_BITS, SIZE - shift)
+        table = []
+        for chunk in range(1 << width):
+            image = 0
+            for offset in range(width):
+                if chunk >> offset & 1:
+                    k, l = symmetry(*CELLS[shift + offset])
+                    image |= 1 << (COLS * k + l)
+            table.append(image)
+        tables.append(table)
+    return tables
+
+
+def transform(tables, mask):
+    """
+    Returns the image of a mask under the symmetry given by its tables.
+    """
+    if len(tables) == 1:
+        return tables[0][mask]
+    image = 0
+    shift = 0
+    for table in tables:
+        image |= table[mask >> shift & (1 << CHUNK_BITS) - 1]
+        shift += CHUNK_BITS
+    return image
+
+
+# Transform tables of every symmetry of the board, the identity first.
+# INVERSES[s] is the symmetry undoing s.
+SYMMETRIES = []
+INVERSES = []
+
+
+def canonical(x, o):
+    """
+    Returns (key, symmetry) for the smallest position key among the
+    images of a position, and the symmetry that produces it.
+    """
+    best_key = None
+    best_symmetry = 0
+    for symmetry, tables in enumerate(SYMMETRIES):
+        key = transform(tables, x) | transform(tables, o) << SIZE
+        if best_key is None or key < best_key:
+            best_key = key
+            best_symmetry = symmetry
+    return best_key, best_symmetry
+
+
+def canonical_key(x, o):
+    """
+    Returns the same key for a position and all its rotations and
+    reflections.
+    """
+    if SIZE <= CHUNK_BITS:
+        return min(tables[0][x] | tables[0][o] << SIZE
+                   for tables in SYMMETRIES)
+    return min(transform(tables, x) | transform(tables, o) << SIZE
+               for tables in SYMMETRIES)
 
 
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    X_num = 0
-    O_num = 0
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == X:
-                X_num += 1
-            elif board[i][j] == O:
-                O_num += 1
-    if X_num <= O_num:
-        return X
-    elif X_num > O_num:
-        return O
-    raise NotImplementedError
+    return bit_player(*encode(board))
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    action_set = set()
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                action_set.add((i, j))
-    return action_set
-    # raise NotImplementedError
+    x, o = encode(board)
+    return {CELLS[bit.bit_length() - 1] for bit in bit_moves(x, o)}
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    new_board = copy.deepcopy(board)
-    now_player = player(board)
-    i = action[0]
-    j = action[1]
-    if i < 0 or j < 0 or i >= 3 or j >= 3:
+    i, j = action
+    if i < 0 or j < 0 or i >= ROWS or j >= COLS:
         raise ValueError("Invalid action")
-    elif new_board[i][j] != EMPTY:
+    x, o = encode(board)
+    bit = 1 << (COLS * i + j)
+    if (x | o) & bit:
         raise ValueError
-    else:
-        new_board[i][j] = now_player
-    return new_board
-    # raise NotImplementedError
+    if bit_player(x, o) == X:
+        return decode(x | bit, o)
+    return decode(x, o | bit)
 
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # 检查所有行和列
-    for i in range(3):
-        # 检查行
-        if board[i][0] == board[i][1] == board[i][2] != EMPTY:
-            return board[i][0]
-        # 检查列
-        if board[0][i] == board[1][i] == board[2][i] != EMPTY:
-            return board[0][i]
-
-    # 检查对角线
-    # 主对角线
-    if board[0][0] == board[1][1] == board[2][2] != EMPTY:
-        return board[0][0]
-    # 反对角线
-    if board[0][2] == board[1][1] == board[2][0] != EMPTY:
-        return board[0][2]
-
-    # 如果没有赢家，返回 None
-    return None
-    # raise NotImplementedError
+    return bit_winner(*encode(board))
 
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board) is not None:
-        return True
-    elif all(elem !=EMPTY for row in board for elem in row):
-        return True
-    else:
-        return False
-    # raise NotImplementedError
+    return bit_terminal(*encode(board))
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    if winner(board) == X:
-        return 1
-    elif winner(board) == O:
-        return -1
-    else:
-        return 0
-    # raise NotImplementedError
+    return bit_utility(*encode(board))
+
 
 # def max_move(board):
 #     best_action = None
@@ -245,71 +464,663 @@ def utility(board):
 # initial_state(), player(board), actions(board), result(board, action)
 # winner(board), terminal(board), utility(board)
 
-def max_value(board, alpha, beta):
+# Transposition table shared by the searches across calls.
+# Maps the key of a position, given as (mover's pieces, opponent's pieces),
+# to (value, flag, depth, move): the negamax score found searching `depth`
+# moves ahead, a flag saying whether it is exact or only a lower or upper
+# bound because alpha-beta pruning cut that search short, and the bit of
+# the best move found, tried first next time, in the orientation of the
+# key (see search_key).
+EXACT = "exact"
+LOWER = "lower"
+UPPER = "upper"
+transposition_table = {}
+table_stats = {"hits": 0, "misses": 0}
+
+# Whether the searches key the table by canonical position, so that a
+# position and its rotations and reflections share one entry
+use_symmetry = True
+
+# Seconds minimax may spend on a move, or None to always search to the
+# end of the game. The search stops at the perf_counter() deadline, which
+# cancel() moves up from another thread while `searching` is set.
+# `search_cancelled` is the threading.Event the running search was given,
+# if any, which also stops it if set before the search starts.
+time_limit = 1.0
+deadline = None
+searching = False
+search_cancelled = None
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the deadline has passed.
+    """
+
+
+class SearchStats():
     """
-    Returns the maximal utility value for a given board state,
-    using alpha-beta pruning.
+    Counters and timing for one minimax call.
     """
-    if terminal(board):
-        return utility(board)
+
+    def __init__(self):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.terminals = 0
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Deepest iteration completed, and whether the book answered
+        self.depth = 0
+        self.book = False
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return (f"SearchStats(nodes={self.nodes}, cutoffs={self.cutoffs}, "
+                f"terminals={self.terminals}, "
+                f"evaluations={self.evaluations}, "
+                f"cache_hits={self.cache_hits}, "
+                f"cache_misses={self.cache_misses}, depth={self.depth}, "
+                f"book={self.book}, seconds={self.seconds:.6f})")
+
+
+# Instrumentation: while `instrument` is True, every minimax call counts
+# its work in a fresh SearchStats, kept in last_stats once it returns.
+# During the call `stats` is that object; otherwise it is None, and a
+# None check is all the search pays.
+instrument = False
+stats = None
+last_stats = None
+
+
+def search_key(x, o):
+    """
+    Returns (key, symmetry) for the transposition table key of a bitboard
+    position and a symmetry taking the position onto the orientation the
+    key stands for, which is the orientation stored moves are kept in.
+    """
+    if not use_symmetry:
+        return x | o << SIZE, 0
+    if SIZE <= CHUNK_BITS:
+        keys = [tables[0][x] | tables[0][o] << SIZE for tables in SYMMETRIES]
+    else:
+        keys = [transform(tables, x) | transform(tables, o) << SIZE
+                for tables in SYMMETRIES]
+    key = min(keys)
+    return key, keys.index(key)
+
+
+def probe(key, alpha, beta, depth):
+    """
+    Looks a position up in the transposition table.
+
+    Returns (value, alpha, beta, move): value is the stored result if it
+    was searched at least `depth` moves ahead and alone settles the
+    search, otherwise None, with alpha and beta narrowed by any such
+    stored bound. move is the stored best move, or 0.
+    """
+    entry = transposition_table.get(key)
+    if entry is None:
+        table_stats["misses"] += 1
+        if stats is not None:
+            stats.cache_misses += 1
+        return None, alpha, beta, 0
+    table_stats["hits"] += 1
+    if stats is not None:
+        stats.cache_hits += 1
+    value, flag, stored_depth, move = entry
+    if stored_depth < depth:
+        return None, alpha, beta, move
+    if flag == EXACT:
+        return value, alpha, beta, move
+    if flag == LOWER:
+        alpha = max(alpha, value)
+    else:
+        beta = min(beta, value)
+    if alpha >= beta:
+        return value, alpha, beta, move
+    return None, alpha, beta, move
+
+
+def store(key, value, alpha, beta, depth, move=0):
+    """
+    Records a search result, flagged against the window it was searched
+    with.
+    """
+    if value <= alpha:
+        transposition_table[key] = (value, UPPER, depth, move)
+    elif value >= beta:
+        transposition_table[key] = (value, LOWER, depth, move)
+    else:
+        transposition_table[key] = (value, EXACT, depth, move)
+
+
+def clear_table():
+    """
+    Empties the transposition table and resets its statistics.
+    """
+    transposition_table.clear()
+    table_stats["hits"] = 0
+    table_stats["misses"] = 0
+
+
+# Move ordering: after the table's move, each node tries the killer moves
+# that last caused a cutoff at the same ply, then the remaining moves by
+# their history score (the squared depths of every cutoff they caused),
+# falling back on STATIC_ORDER. Both are reset for each new search, so
+# every iteration of iterative deepening learns from the ones before.
+# ordering is "full", "static" (table move, then STATIC_ORDER) or "none"
+# (lowest cell first), and use_pvs switches principal variation search
+# back to plain alpha-beta, for comparing how much each one saves.
+ordering = "full"
+use_pvs = True
+killers = []
+history = {}
+
+
+def reset_ordering():
+    """
+    Forgets the killer moves and history scores of earlier searches.
+    """
+    global killers
+    killers = [[0, 0] for _ in range(SIZE + 1)]
+    history.clear()
+
+
+def ordered_moves(mine, theirs, first=0, ply=0):
+    """
+    Yields the bit of every empty cell in the order the search should
+    try them, starting with `first` if it is empty.
+    """
+    empty = FULL & ~(mine | theirs)
+    if ordering == "none":
+        yield from bit_moves(mine, theirs)
+        return
+    if first & empty:
+        yield first
+        empty ^= first
+    if ordering == "full":
+        for killer in killers[ply]:
+            if killer & empty:
+                yield killer
+                empty ^= killer
+        rest = [bit for bit in STATIC_ORDER if bit & empty]
+        # Stable, so cells without history keep their static order
+        rest.sort(key=lambda bit: -history.get(bit, 0))
+        yield from rest
+    else:
+        for bit in STATIC_ORDER:
+            if bit & empty:
+                yield bit
+
+
+def record_cutoff(bit, depth, ply):
+    """
+    Remembers a move that caused a cutoff, as a killer at its ply and in
+    its history score.
+    """
+    slot = killers[ply]
+    if slot[0] != bit:
+        slot[1] = slot[0]
+        slot[0] = bit
+    history[bit] = history.get(bit, 0) + depth * depth
+
+
+def negamax(mine, theirs, alpha, beta, depth=None, ply=0):
+    """
+    Returns the score of a position for the player to move, who holds
+    `mine` against `theirs`: WIN if they win with best play, -WIN if they
+    lose, 0 for a draw, using principal variation search.
+
+    Searches `depth` moves ahead, or to the end of the game if None,
+    scoring positions cut off before the end with evaluate. The first
+    move gets the full (alpha, beta) window and every later one only
+    the null window (alpha, alpha + 1), which is enough to show that it
+    is no better, and is searched again in full only if it is.
+    """
+    if stats is not None:
+        stats.nodes += 1
+    remaining = (FULL & ~(mine | theirs)).bit_count()
+    if depth is None or depth > remaining:
+        depth = remaining
+    key, symmetry = search_key(mine, theirs)
+    value, alpha, beta, first = probe(key, alpha, beta, depth)
+    if value is not None:
+        return value
+    if first and symmetry:
+        # The table keeps moves in the key's orientation, not this one's
+        first = transform(SYMMETRIES[INVERSES[symmetry]], first)
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout
+    original_alpha, original_beta = alpha, beta
+
+    # Only the player who just moved can have completed a line
+    lost = won(theirs)
+    if lost or not remaining:
+        if stats is not None:
+            stats.terminals += 1
+        v = -WIN if lost else 0
+        transposition_table[key] = (v, EXACT, depth, 0)
+        return v
+    if depth == 0:
+        if stats is not None:
+            stats.evaluations += 1
+        v = evaluate(mine, theirs)
+        transposition_table[key] = (v, EXACT, 0, 0)
+        return v
 
     v = -math.inf
-    for action in actions(board):
-        v = max(v, min_value(result(board, action), alpha, beta))
+    best = 0
+    for bit in ordered_moves(mine, theirs, first, ply):
+        if not best or not use_pvs:
+            score = -negamax(theirs, mine | bit, -beta, -alpha,
+                             depth - 1, ply + 1)
+        else:
+            score = -negamax(theirs, mine | bit, -alpha - 1, -alpha,
+                             depth - 1, ply + 1)
+            if alpha < score < beta:
+                score = -negamax(theirs, mine | bit, -beta, -score,
+                                 depth - 1, ply + 1)
+        if score > v:
+            v = score
+            best = bit
         alpha = max(alpha, v)
         if alpha >= beta:
-            # Beta Cutoff (剪枝)
+            # Cutoff (剪枝)
+            if stats is not None:
+                stats.cutoffs += 1
+            record_cutoff(bit, depth, ply)
             break
+    if symmetry:
+        best = transform(SYMMETRIES[symmetry], best)
+    store(key, v, original_alpha, original_beta, depth, best)
     return v
 
 
+def position_value(x, o, alpha=-math.inf, beta=math.inf, depth=None):
+    """
+    Returns the value of a bitboard position for X: 1 if X wins with best
+    play, -1 if O does, 0 for a draw, or a heuristic value in between if
+    searched only `depth` moves ahead.
+    """
+    if bit_terminal(x, o):
+        return bit_utility(x, o)
+    if bit_player(x, o) == X:
+        score = negamax(x, o, alpha * WIN, beta * WIN, depth)
+    else:
+        score = -negamax(o, x, -beta * WIN, -alpha * WIN, depth)
+    return score // WIN if score % WIN == 0 else score / WIN
+
+
+def max_value(board, alpha, beta):
+    """
+    Returns the minimax value of a board for X, searched with alpha-beta
+    pruning within the (alpha, beta) window. Whoever is to move, the
+    value is the one X maximizes and O minimizes.
+    """
+    return position_value(*encode(board), alpha, beta)
+
+
 def min_value(board, alpha, beta):
     """
-    Returns the minimal utility value for a given board state,
-    using alpha-beta pruning.
+    Returns the minimax value of a board for X, the same as max_value:
+    which player minimizes follows from the board itself.
     """
-    if terminal(board):
-        return utility(board)
+    return max_value(board, alpha, beta)
+
 
-    v = math.inf
-    for action in actions(board):
-        v = min(v, max_value(result(board, action), alpha, beta))
-        beta = min(beta, v)
-        if beta <= alpha:
-            # Alpha Cutoff (剪枝)
+def root_moves(mine, theirs, first=0):
+    """
+    Yields the moves of a position in search order, skipping any move
+    that leads to a rotation or reflection of an earlier move's result.
+    """
+    seen = set()
+    for bit in ordered_moves(mine, theirs, first):
+        key = canonical_key(mine | bit, theirs)
+        if key not in seen:
+            seen.add(key)
+            yield bit
+
+
+def best_move(x, o, depth=None, first=0, progress=None):
+    """
+    Returns (move, score) for the best move of the player to move on a
+    non-terminal bitboard position and its negamax score for that
+    player, searching `depth` moves ahead (to the end of the game if
+    None) and trying the move `first` before others.
+
+    If given, progress[0] is kept set to the best move found so far, for
+    when the search is cut short.
+    """
+    mine, theirs = (x, o) if bit_player(x, o) == X else (o, x)
+    moves = root_moves(mine, theirs, first) if use_symmetry \
+        else ordered_moves(mine, theirs, first)
+    child_depth = None if depth is None else depth - 1
+    alpha, beta = -math.inf, math.inf
+    best = None
+    for bit in moves:
+        if best is None or not use_pvs:
+            score = -negamax(theirs, mine | bit, -beta, -alpha, child_depth, 1)
+        else:
+            score = -negamax(theirs, mine | bit, -alpha - 1, -alpha,
+                             child_depth, 1)
+            if score > alpha:
+                score = -negamax(theirs, mine | bit, -beta, -score,
+                                 child_depth, 1)
+        if best is None or score > alpha:
+            alpha = score
+            best = bit
+            if progress is not None:
+                progress[0] = bit
+        if alpha == WIN:
             break
-    return v
+    return best, alpha
 
 
-def minimax(board):
+def search(x, o, limit=None, cancelled=None):
+    """
+    Returns the best move found for a non-terminal bitboard position by
+    iterative deepening, within `limit` seconds if given, and stopping
+    as if out of time once the threading.Event `cancelled` is set.
+
+    Each depth starts from the previous depth's best move, and the search
+    stops early once a depth is complete to the end of the game or proves
+    a win for either player. When time runs out mid-depth, the best move
+    found so far is returned: the unfinished depth searches the last
+    one's best move first, so any move it has already found is at least
+    as good.
+    """
+    global deadline, searching, search_cancelled
+    reset_ordering()
+    remaining = (FULL & ~(x | o)).bit_count()
+    move = 0
+    search_cancelled = cancelled
+    searching = True
+    deadline = None if limit is None else time.perf_counter() + limit
+    # Checked after setting `searching`, so a cancel() racing with the
+    # start of the search is seen either here or by cancel() itself
+    if cancelled is not None and cancelled.is_set():
+        deadline = -math.inf
+    try:
+        for depth in range(1, remaining + 1):
+            progress = [0]
+            try:
+                move, score = best_move(x, o, depth, move, progress)
+            except SearchTimeout:
+                move = progress[0] or move
+                break
+            if stats is not None:
+                stats.depth = depth
+            if abs(score) == WIN:
+                break
+    finally:
+        searching = False
+        search_cancelled = None
+        deadline = None
+    if not move:
+        move = next(bit_moves(x, o))
+    return move
+
+
+def cancel(cancelled=None):
+    """
+    Stops a search running on another thread as if its time had run
+    out, so that its minimax call returns the best move found so far.
+
+    Given the threading.Event passed to a minimax call, sets it and only
+    stops that call's search, which then also stops as soon as it starts
+    if the call has not reached it yet. Without one, only a search that
+    is already running is stopped.
+    """
+    global deadline
+    if cancelled is not None:
+        cancelled.set()
+    if searching and (cancelled is None or cancelled is search_cancelled):
+        deadline = -math.inf
+
+
+# Opening book: the best move of every reachable canonical position,
+# solved once and saved next to this file, for boards small enough to
+# solve outright. The file records a fingerprint of the engine source
+# and board, and is regenerated whenever either changes.
+BOOK_MAX_CELLS = 9
+BOOK_MAGIC = b"TTTBOOK1"
+BOOK_HEADER = struct.Struct("<8s32sI")
+
+# Maps canonical position key to the cell index (COLS * i + j) of its
+# best move in the canonical orientation, once loaded
+opening_book = None
+use_book = True
+
+
+def book_path():
+    """
+    Returns the path of the opening book file for the current board.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    if (ROWS, COLS, K) == (3, 3, 3):
+        return os.path.join(directory, "tictactoe.book")
+    return os.path.join(directory, f"tictactoe-{ROWS}x{COLS}-{K}.book")
+
+
+def engine_fingerprint():
+    """
+    Returns a digest of this module's source and the board geometry,
+    which changes whenever either does.
+    """
+    with open(os.path.abspath(__file__), "rb") as f:
+        digest = hashlib.sha256(f.read())
+    digest.update(bytes([ROWS, COLS, K]))
+    return digest.digest()
+
+
+def canonical_positions():
+    """
+    Returns the canonical form of every reachable non-terminal position.
+    """
+    positions = []
+    seen = {0}
+    frontier = [(0, 0)]
+    while frontier:
+        x, o = frontier.pop()
+        if bit_terminal(x, o):
+            continue
+        positions.append((x, o))
+        mover = bit_player(x, o)
+        for bit in bit_moves(x, o):
+            child = (x | bit, o) if mover == X else (x, o | bit)
+            key, symmetry = canonical(*child)
+            if key not in seen:
+                seen.add(key)
+                tables = SYMMETRIES[symmetry]
+                frontier.append((transform(tables, child[0]),
+                                 transform(tables, child[1])))
+    return positions
+
+
+def generate_book():
+    """
+    Solves every reachable canonical position, returning the book.
+    """
+    book = {}
+    for x, o in canonical_positions():
+        bit, _ = best_move(x, o)
+        book[x | o << SIZE] = bit.bit_length() - 1
+    return book
+
+
+def verify_book(book):
+    """
+    Raises an exception unless the book covers every reachable canonical
+    position with a legal move that keeps its minimax value.
+
+    Values come from plain_value rather than the search that generated
+    the book, so that a bug in the search or its table cannot vouch for
+    itself.
+    """
+    clear_table()
+    values = {}
+    positions = canonical_positions()
+    if len(book) != len(positions):
+        raise Exception("Opening book does not cover every position")
+    for x, o in positions:
+        cell = book.get(x | o << SIZE)
+        if cell is None:
+            raise Exception("Opening book is missing a position")
+        bit = 1 << cell
+        if (x | o) & bit:
+            raise Exception("Opening book move is not legal")
+        if bit_player(x, o) == X:
+            after = plain_value(x | bit, o, values)
+        else:
+            after = plain_value(x, o | bit, values)
+        if plain_value(x, o, values) != after:
+            raise Exception("Opening book move is not optimal")
+
+
+def plain_value(x, o, values):
+    """
+    Returns the minimax value of a bitboard position for X, trying every
+    move without pruning, move ordering or the transposition table, and
+    remembering the value of every position searched in `values`.
+    """
+    key = x | o << SIZE
+    value = values.get(key)
+    if value is None:
+        if bit_terminal(x, o):
+            value = bit_utility(x, o)
+        elif bit_player(x, o) == X:
+            value = max(plain_value(x | bit, o, values)
+                        for bit in bit_moves(x, o))
+        else:
+            value = min(plain_value(x, o | bit, values)
+                        for bit in bit_moves(x, o))
+        values[key] = value
+    return value
+
+
+def save_book(book, path=None):
+    """
+    Writes the book as packed (key << 4 | cell) entries, sorted by key,
+    behind a header holding the engine fingerprint, through a uniquely
+    named temporary file renamed over the old book.
+    """
+    path = path or book_path()
+    entries = array("I", sorted(key << 4 | cell for key, cell in book.items()))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(BOOK_HEADER.pack(BOOK_MAGIC, engine_fingerprint(),
+                                     len(entries)))
+            f.write(entries.tobytes())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_book(path=None):
+    """
+    Returns the book saved at path, or None if it is missing, corrupt or
+    was generated by a different engine or for a different board.
+    """
+    try:
+        with open(path or book_path(), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < BOOK_HEADER.size:
+        return None
+    magic, fingerprint, count = BOOK_HEADER.unpack_from(data)
+    if magic != BOOK_MAGIC or fingerprint != engine_fingerprint():
+        return None
+    entries = array("I")
+    entries.frombytes(data[BOOK_HEADER.size:])
+    if len(entries) != count:
+        return None
+    return {entry >> 4: entry & 0xF for entry in entries}
+
+
+def load_book(path=None):
+    """
+    Loads the opening book, generating, verifying and saving a fresh one
+    if the saved book is missing or stale.
+    """
+    global opening_book
+    book = read_book(path)
+    if book is None:
+        book = generate_book()
+        verify_book(book)
+        try:
+            save_book(book, path)
+        except OSError:
+            # Still usable for this run, just not cached
+            pass
+    opening_book = book
+    return book
+
+
+def minimax(board, cancelled=None):
     """
     Returns the optimal action for the current player on the board.
+
+    Boards too large to solve within time_limit get the best action
+    found by then instead, or by the time the threading.Event
+    `cancelled` is set through cancel().
+    """
+    global stats, last_stats
+    if not instrument:
+        return choose_action(board, cancelled)
+    stats = SearchStats()
+    start = time.perf_counter()
+    try:
+        return choose_action(board, cancelled)
+    finally:
+        stats.seconds = time.perf_counter() - start
+        last_stats, stats = stats, None
+
+
+def choose_action(board, cancelled=None):
     """
-    if terminal(board):
+    Returns the action minimax plays on the board.
+    """
+    x, o = encode(board)
+    if bit_terminal(x, o):
         return None
 
-    current_player = player(board)
-
-    if current_player == X:
-        # X is the maximizing player
-        best_value = -math.inf
-        best_move = None
-        for action in actions(board):
-            # 初始调用时, alpha 是 -inf, beta 是 +inf
-            val = min_value(result(board, action), -math.inf, math.inf)
-            if val > best_value:
-                best_value = val
-                best_move = action
-        return best_move
-
-    else:  # current_player == O
-        # O is the minimizing player
-        best_value = math.inf
-        best_move = None
-        for action in actions(board):
-            # 初始调用时, alpha 是 -inf, beta 是 +inf
-            val = max_value(result(board, action), -math.inf, math.inf)
-            if val < best_value:
-                best_value = val
-                best_move = action
-        return best_move
\ No newline at end of file
+    # Search the canonical orientation, where equivalent moves collapse
+    # into one, then map the chosen move back onto the caller's board
+    if use_symmetry or use_book:
+        _, symmetry = canonical(x, o)
+        tables = SYMMETRIES[symmetry]
+        inverse = SYMMETRIES[INVERSES[symmetry]]
+        canonical_x, canonical_o = transform(tables, x), transform(tables, o)
+
+    if use_book and SIZE <= BOOK_MAX_CELLS:
+        if opening_book is None:
+            load_book()
+        cell = opening_book.get(canonical_x | canonical_o << SIZE)
+        if cell is not None:
+            if stats is not None:
+                stats.book = True
+            move = transform(inverse, 1 << cell)
+            return CELLS[move.bit_length() - 1]
+
+    if use_symmetry:
+        move = transform(inverse, search(canonical_x, canonical_o,
+                                         time_limit, cancelled))
+    else:
+        move = search(x, o, time_limit, cancelled)
+    return CELLS[move.bit_length() - 1]
+
+
+# Start on the standard 3x3 board
+configure()
@@ -11,6 +11,17 @@ class Sentence():
         """Returns string formula representing logical sentence."""
         return ""
 
+    def expression(self, index):
+        """
+        Returns a Python expression evaluating the sentence over an integer
+        model `m`, where bit index[name] holds the value of each symbol.
+
+        Binary connectives parenthesize themselves; symbols and negations
+        bind tighter than any of them and are left bare, so that long
+        chains of Not do not run into Python's nesting limits.
+        """
+        raise Exception("nothing to compile")
+
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
         return set()
@@ -65,6 +76,12 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
+    def expression(self, index):
+        try:
+            return f"m >> {index[self.name]} & 1"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
     def symbols(self):
         return {self.name}
 
@@ -89,6 +106,9 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
+    def expression(self, index):
+        return f"not {self.operand.expression(index)}"
+
     def symbols(self):
         return self.operand.symbols()
 
@@ -126,6 +146,13 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
+    def expression(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            [conjunct.expression(index) for conjunct in self.conjuncts]
+        ) + ")"
+
     def symbols(self):
         return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
 
@@ -157,6 +184,13 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
+    def expression(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            [disjunct.expression(index) for disjunct in self.disjuncts]
+        ) + ")"
+
     def symbols(self):
         return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
 
@@ -188,6 +222,10 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
+    def expression(self, index):
+        return (f"(not {self.antecedent.expression(index)}"
+                f" or {self.consequent.expression(index)})")
+
     def symbols(self):
         return set.union(self.antecedent.symbols(), self.consequent.symbols())
 
@@ -221,6 +259,10 @@ class Biconditional(Sentence):
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
+    def expression(self, index):
+        return (f"((not {self.left.expression(index)})"
+                f" == (not {self.right.expression(index)}))")
+
     def symbols(self):
         return set.union(self.left.symbols(), self.right.symbols())
 
@@ -228,36 +270,44 @@ class Biconditional(Sentence):
 def model_check(knowledge, query):
     """Checks if knowledge base entails query."""
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
-
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    # Get all symbols in both knowledge and query, in a fixed order so
+    # that bit i of a model number holds the value of symbols[i]
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    models = range(1 << len(symbols))
+
+    check_all = compile_check(knowledge, query, index)
+    if check_all is None:
+        # Too deeply nested for Python to compile, so walk the sentences
+        # for each model instead
+        for m in models:
+            model = {symbol: bool(m >> i & 1) for symbol, i in index.items()}
+            if knowledge.evaluate(model) and not query.evaluate(model):
+                return False
+        return True
 
     # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    return check_all(models)
+
+
+def compile_check(knowledge, query, index):
+    """
+    Compiles the knowledge base and query into one loop over integer
+    models, looking for one where the knowledge base is true but the
+    query is not. Returns None if the sentences are nested too deeply
+    for Python to compile.
+    """
+    source = (
+        "def check_all(models):\n"
+        "    for m in models:\n"
+        f"        if ({knowledge.expression(index)}) and not "
+        f"({query.expression(index)}):\n"
+        "            return False\n"
+        "    return True\n"
+    )
+    namespace = {}
+    try:
+        exec(source, namespace)
+    except (SyntaxError, MemoryError, RecursionError):
+        return None
+    return namespace["check_all"]